@@ -4,12 +4,15 @@ RBAC/菜单 迁移脚本配置
 
 - 集中维护迁移列表及执行顺序
 - 新增迁移时在此追加，版本会自动变化
+- MIGRATION_DEPENDENCIES 声明迁移间依赖，供 scripts/run_all_migrations.py 分层并发执行
+- 迁移台账中依赖方的校验和包含其依赖的校验和：依赖变化时依赖方随之重跑
 """
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 # 迁移列表：(模块名, 函数名)，顺序敏感
 MIGRATIONS: List[Tuple[str, str]] = [
     ("migrate_rbac", "migrate"),
+    ("migrate_menu_configs_global_unique", "migrate"),
     ("migrate_permission_menu_type", "migrate"),
     ("migrate_permission_config_fields", "migrate"),
     ("migrate_add_config_menu", "migrate"),
@@ -30,4 +33,46 @@ MIGRATIONS: List[Tuple[str, str]] = [
     ("migrate_add_notification_menu", "migrate"),
     ("migrate_add_notification_api_permissions", "migrate"),
     ("migrate_add_notification_menu_config", "migrate"),
+    ("migrate_permission_config_backfill", "migrate"),
 ]
+
+# 迁移依赖：模块名 -> 必须先完成的模块列表（未列出的模块视为无依赖）
+# 同层迁移会并发执行：修改 permissions 表结构的迁移单独成层，写 menu_configs 的迁移按先后串联
+MIGRATION_DEPENDENCIES: Dict[str, List[str]] = {
+    "migrate_menu_configs_global_unique": ["migrate_rbac"],
+    "migrate_permission_menu_type": ["migrate_rbac"],
+    "migrate_permission_config_fields": ["migrate_permission_menu_type"],
+    "migrate_add_config_menu": ["migrate_permission_config_fields"],
+    "migrate_add_models_menu": ["migrate_add_config_menu", "migrate_menu_configs_global_unique"],
+    "migrate_add_tables_menu": ["migrate_add_config_menu"],
+    "migrate_add_tables_menu_button_permissions": ["migrate_add_tables_menu"],
+    "migrate_add_team_menu": ["migrate_permission_config_fields"],
+    "migrate_add_rbac_submenus": ["migrate_permission_config_fields"],
+    "migrate_api_permissions": ["migrate_permission_config_fields"],
+    "migrate_add_tables_api_permissions": ["migrate_permission_config_fields"],
+    "migrate_add_reset_authcode_permission": ["migrate_permission_config_fields"],
+    "migrate_remove_team_auth_menu": ["migrate_permission_config_fields"],
+    "migrate_add_mcp_menu": ["migrate_add_config_menu"],
+    "migrate_add_mcp_api_permissions": ["migrate_permission_config_fields"],
+    "migrate_add_notification_menu": ["migrate_add_config_menu", "migrate_add_models_menu"],
+    "migrate_add_notification_api_permissions": ["migrate_add_notification_menu"],
+    "migrate_add_notification_menu_config": ["migrate_add_notification_menu", "migrate_menu_configs_global_unique"],
+    # 种子迁移新增的权限不带 type_name / group_name 等字段，回填须排在全部写入 permissions 的迁移之后；
+    # 台账校验和叠加依赖的校验和（见 scripts/_ledger.py），任一种子迁移变化时本迁移随之重跑
+    "migrate_permission_config_backfill": [
+        "migrate_permission_menu_type",
+        "migrate_add_config_menu",
+        "migrate_add_models_menu",
+        "migrate_add_tables_menu",
+        "migrate_add_tables_menu_button_permissions",
+        "migrate_add_team_menu",
+        "migrate_add_rbac_submenus",
+        "migrate_api_permissions",
+        "migrate_add_tables_api_permissions",
+        "migrate_add_reset_authcode_permission",
+        "migrate_add_mcp_menu",
+        "migrate_add_mcp_api_permissions",
+        "migrate_add_notification_menu",
+        "migrate_add_notification_api_permissions",
+    ],
+}
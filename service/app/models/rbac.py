@@ -1,7 +1,7 @@
 """
 RBAC（基于角色的访问控制）相关模型
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table, Text, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table, Text, Integer, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -81,6 +81,10 @@ class Permission(Base):
 class MenuConfig(Base):
     """菜单配置模型（支持团队级别的菜单顺序和层级覆盖）"""
     __tablename__ = "menu_configs"
+    __table_args__ = (
+        # 全局配置（team_id 为 NULL）每个权限仅一条，供迁移脚本 ON CONFLICT upsert 使用
+        Index('uq_menu_configs_perm_global', 'permission_id', unique=True, postgresql_where=text('team_id IS NULL')),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     permission_id = Column(String, ForeignKey("permissions.id", ondelete="CASCADE"), nullable=False, index=True)  # 权限ID
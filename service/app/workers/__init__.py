@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Worker 模块
+"""
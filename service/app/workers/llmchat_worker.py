@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+LLM Chat 异步任务 Worker
+从 Redis Stream 消费任务，执行 LLM 调用，更新任务状态，发送通知
+入口脚本：scripts/llmchat_worker.py
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# service 目录
+project_root = Path(__file__).resolve().parent.parent.parent
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+
+from app.core.database import init_db, AsyncSessionLocal
+from app.core.config import settings
+
+# #region agent log
+# 调试日志开关（模块加载时读取一次，默认开启；设 LLMCHAT_WORKER_DEBUG_LOG=0 关闭）；关闭时不构造任何日志内容
+DEBUG_LOG_ENABLED = os.getenv("LLMCHAT_WORKER_DEBUG_LOG", "1").lower() not in ("0", "false", "no")
+_DEBUG_LOG_PATH = project_root.parent / ".cursor" / "debug.log"
+
+
+def _worker_debug_log(msg: str, data: dict, hypothesis_id: str = ""):
+    if not DEBUG_LOG_ENABLED:
+        return
+    try:
+        import time
+        p = _DEBUG_LOG_PATH
+        p.parent.mkdir(parents=True, exist_ok=True)
+        entry = json.dumps({"message": msg, "data": data, "hypothesisId": hypothesis_id, "timestamp": int(time.time() * 1000)}, ensure_ascii=False) + "\n"
+        with open(p, "a", encoding="utf-8") as f:
+            f.write(entry)
+    except Exception:
+        pass
+# #endregion
+from app.models.llmchat_task import LLMChatTask
+from app.services.llmchat_api_executor import execute_api_prompt_request
+from app.services.notification_config_service import NotificationConfigService
+from app.services.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+STREAM_NAME = getattr(settings, "LLMCHAT_STREAM_NAME", "llmchat:tasks") or "llmchat:tasks"
+CONSUMER_GROUP = "llmchat-workers"
+# 每个进程独立的消费者名称，多实例部署时各自消费、互不抢占；可通过环境变量固定
+CONSUMER_NAME = os.getenv("WORKER_CONSUMER_NAME") or f"worker-{socket.gethostname()}-{os.getpid()}"
+BLOCK_MS = 5000
+# 消息可见性超时：pending 消息空闲超过该时长才会被 XAUTOCLAIM 认领
+VISIBILITY_MS = 30000
+# 处理中的消息每隔该秒数 XCLAIM 一次以刷新空闲时间，避免长耗时 LLM 调用被重复认领
+HEARTBEAT_INTERVAL = 15
+# 并发处理的消费者协程数；每次 XREADGROUP 只读取空闲消费者数量的消息，不在本地预取积压
+WORKER_CONCURRENCY = max(1, int(os.getenv("LLMCHAT_WORKER_CONCURRENCY", "4")))
+# 消费异常时的指数退避上限（秒），实际等待带 ±50% 抖动，避免多个 worker 同步重连
+MAX_BACKOFF_SECONDS = 30.0
+# 邮件通知配置无效时直接将任务置为 failed 而不调用模型（默认仅记录告警并照常执行、跳过邮件）
+FAIL_ON_INVALID_NOTIFICATION = os.getenv("LLMCHAT_FAIL_ON_INVALID_NOTIFICATION", "").lower() in ("1", "true", "yes")
+
+
+async def _validate_email_notification(
+    db: AsyncSession, team_id: str, notification_config_str: str
+) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+    """
+    校验邮件通知配置并解析发送参数
+
+    Returns:
+        (是否可发送, 不可发送的原因, {"email_to", "content_type", "send_config"})
+    """
+    notification_config = json.loads(notification_config_str) if notification_config_str else {}
+    email_to = notification_config.get("email_to") or notification_config.get("to")
+    # 兼容 content_type（llmchat API）与 email_content_type（组合 API）
+    content_type = (
+        notification_config.get("content_type")
+        or notification_config.get("email_content_type")
+        or "html"
+    )
+    if content_type not in ("html", "plain", "file"):
+        content_type = "html"
+    if not email_to:
+        return False, "notification_config 中无 email_to", None
+    team_id_val = team_id.strip() if (team_id and isinstance(team_id, str)) else None
+    if not team_id_val:
+        team_id_val = None
+    email_cfg = await NotificationConfigService.get_by_type(db, "email", team_id_val)
+    if not email_cfg:
+        return False, (
+            f"未找到邮件配置 team_id={team_id_val or '全局'}"
+            "（请检查通知中心是否已配置，且 team_id 与任务的团队一致）"
+        ), None
+    send_config = await NotificationConfigService.get_config_dict(email_cfg)
+    provider = (send_config or {}).get("provider") or ""
+    if provider == "smtp":
+        if not send_config or not (send_config.get("host") or send_config.get("smtp_host")) or not (send_config.get("from_email") or send_config.get("from")):
+            return False, "SMTP 配置不完整（host/from_email）", None
+    else:
+        if not send_config or not send_config.get("api_user") or not send_config.get("api_key"):
+            return False, "SendCloud 配置不完整（api_user/api_key）", None
+    return True, "", {"email_to": email_to, "content_type": content_type, "send_config": send_config}
+
+
+async def process_one(db: AsyncSession, task_id: str, scene: str, request_payload_str: str, team_id: str, notification_type: str, notification_config_str: str):
+    """处理单个任务
+
+    认领（pending -> running）与终态写入各为一条 UPDATE，整个任务只提交一次。
+    """
+    claimed = await db.execute(
+        update(LLMChatTask)
+        .where(LLMChatTask.id == task_id, LLMChatTask.status == "pending")
+        .values(status="running")
+        .returning(LLMChatTask.id)
+    )
+    if claimed.scalar_one_or_none() is None:
+        logger.info("[LLMChatTask] 任务不存在或已处理过，跳过 task_id=%s", task_id)
+        await db.rollback()
+        return
+
+    final_values: dict = {}
+    logger.info("[LLMChatTask] 任务开始执行 status=running task_id=%s scene=%s", task_id, scene)
+
+    try:
+        email_notify = None
+        if notification_type == "email":
+            try:
+                ok, reason, email_notify = await _validate_email_notification(db, team_id, notification_config_str)
+            except Exception as e:
+                logger.exception("[LLMChatTask] 校验邮件通知配置异常 task_id=%s: %s", task_id, e)
+                ok, reason, email_notify = False, str(e), None
+            if not ok:
+                if FAIL_ON_INVALID_NOTIFICATION:
+                    final_values = {"status": "failed", "error_message": f"通知配置无效：{reason}", "completed_at": datetime.utcnow()}
+                    logger.warning("[LLMChatTask] 通知配置无效，未调用模型 status=failed task_id=%s reason=%s", task_id, reason)
+                    return
+                logger.warning("[LLMChatTask] 将跳过邮件：%s task_id=%s", reason, task_id)
+
+        request_payload = json.loads(request_payload_str) if request_payload_str else {}
+        team_code = request_payload.get("teamCode")
+        content, err = await execute_api_prompt_request(
+            db=db,
+            scene=scene,
+            request_dict=request_payload,
+            team_code=team_code,
+            team_id=team_id or None,
+        )
+
+        if err:
+            final_values = {"status": "failed", "error_message": err, "completed_at": datetime.utcnow()}
+            logger.info("[LLMChatTask] 任务失败 status=failed task_id=%s error=%s", task_id, err[:200] if err else "-")
+        else:
+            final_values = {"status": "completed", "result_content": content, "completed_at": datetime.utcnow()}
+            logger.info("[LLMChatTask] 任务完成 status=completed task_id=%s", task_id)
+
+            # 发送通知（配置已在 LLM 调用前校验并解析）
+            if email_notify and content:
+                try:
+                    subject = f"[LLM Chat] 场景 {scene} 处理完成"
+                    ok = await EmailService.send_email(
+                        config=email_notify["send_config"],
+                        to=email_notify["email_to"],
+                        subject=subject,
+                        content=content or "",
+                        content_type=email_notify["content_type"],
+                    )
+                    if ok:
+                        logger.info("[LLMChatTask] 邮件通知已发送 task_id=%s to=%s", task_id, email_notify["email_to"])
+                    else:
+                        logger.warning("[LLMChatTask] 邮件通知发送失败 task_id=%s to=%s", task_id, email_notify["email_to"])
+                except Exception as e:
+                    logger.exception("发送邮件通知失败: %s", e)
+    except Exception as e:
+        final_values = {"status": "failed", "error_message": str(e), "completed_at": datetime.utcnow()}
+        logger.exception("[LLMChatTask] 任务执行异常 status=failed task_id=%s: %s", task_id, e)
+    finally:
+        if final_values:
+            await db.execute(
+                update(LLMChatTask).where(LLMChatTask.id == task_id).values(**final_values)
+            )
+        await db.commit()
+
+
+async def _extend_claim(redis_client, msg_id) -> None:
+    """周期性刷新处理中消息的空闲时间（XCLAIM JUSTID），任务结束后由调用方取消"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            await redis_client.xclaim(
+                STREAM_NAME, CONSUMER_GROUP, CONSUMER_NAME, min_idle_time=0, message_ids=[msg_id], justid=True
+            )
+        except Exception as e:
+            logger.debug("[LLMChatTask] 刷新消息空闲时间失败 msg_id=%s: %s", msg_id, e)
+
+
+def _create_worker_redis() -> redis.Redis:
+    """
+    Worker 专用 Redis 客户端：显式设置 socket 超时与重试，半开连接时在有限时间内恢复。
+    socket_timeout 需大于 XREADGROUP 的 block 时长。
+    """
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD or None,
+        db=settings.REDIS_DB,
+        decode_responses=True,
+        socket_timeout=BLOCK_MS / 1000 + 10,
+        socket_connect_timeout=5,
+        health_check_interval=30,
+        retry_on_timeout=True,
+        retry=Retry(ExponentialBackoff(cap=10, base=1), retries=3),
+    )
+
+
+async def _handle_message(redis_client, msg_id, fields) -> None:
+    """处理单条 Stream 消息：执行任务并 ack"""
+    # 客户端启用 decode_responses（启动时已校验），fields 即为 str -> str 的 dict
+    fd = fields
+    task_id = fd.get("task_id")
+    scene = fd.get("scene", "")
+    request_payload = fd.get("request_payload", "{}")
+    team_id = fd.get("team_id", "")
+    notification_type = fd.get("notification_type", "")
+    notification_config = fd.get("notification_config", "{}")
+
+    logger.info("[LLMChatTask] 从 Redis Stream 消费任务 task_id=%s scene=%s", task_id, scene)
+    # #region agent log
+    if DEBUG_LOG_ENABLED:
+        _worker_debug_log("worker_consumed", {"task_id": task_id, "scene": scene, "msg_id": str(msg_id)}, "H1")
+    # #endregion
+
+    heartbeat = asyncio.create_task(_extend_claim(redis_client, msg_id))
+    try:
+        async with AsyncSessionLocal() as db:
+            await process_one(db, task_id, scene, request_payload, team_id, notification_type, notification_config)
+    finally:
+        heartbeat.cancel()
+    await redis_client.xack(STREAM_NAME, CONSUMER_GROUP, msg_id)
+
+
+async def _consume(redis_client, queue: asyncio.Queue, slots: asyncio.Semaphore) -> None:
+    """消费者协程：从本地队列取消息处理，单条失败不影响后续消息（未 ack 的消息将被 XAUTOCLAIM 重新认领）"""
+    while True:
+        msg_id, fields = await queue.get()
+        try:
+            await _handle_message(redis_client, msg_id, fields)
+        except Exception as e:
+            logger.exception("[LLMChatTask] 处理消息异常 msg_id=%s: %s", msg_id, e)
+        finally:
+            queue.task_done()
+            slots.release()
+
+
+async def _acquire_free_slots(slots: asyncio.Semaphore) -> int:
+    """等待至少一个空闲消费者，并一次取走当前全部空闲名额，返回名额数"""
+    await slots.acquire()
+    free = 1
+    while free < WORKER_CONCURRENCY and not slots.locked():
+        await slots.acquire()
+        free += 1
+    return free
+
+
+async def run_worker():
+    await init_db()
+    redis_client = _create_worker_redis()
+    if not redis_client.connection_pool.connection_kwargs.get("decode_responses"):
+        raise RuntimeError("LLMChat Worker 需要 decode_responses=True 的 Redis 客户端")
+    # #region agent log
+    _worker_debug_log("Worker started, Redis connected", {"stream": STREAM_NAME, "consumer_group": CONSUMER_GROUP}, "H1")
+    # #endregion
+
+    # 创建 consumer group（若不存在）
+    try:
+        await redis_client.xgroup_create(STREAM_NAME, CONSUMER_GROUP, id="0", mkstream=True)
+    except Exception:
+        pass  # 已存在则忽略
+
+    # 读取协程只负责 XREADGROUP 并入队，N 个消费者协程并行处理，使 Redis 阻塞读取与 LLM 调用重叠。
+    # 读取前先取得空闲消费者名额，只读取与名额等量的消息：入队的消息立即有消费者处理并启动心跳，
+    # 不会在本地队列中无心跳地等待超过 VISIBILITY_MS 而被其他 worker 的 XAUTOCLAIM 重复认领
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+    consumers = [asyncio.create_task(_consume(redis_client, queue, slots)) for _ in range(WORKER_CONCURRENCY)]
+
+    _last_log = 0.0
+    _pending_start = "0-0"
+    backoff = 1.0
+    try:
+        while True:
+            free = await _acquire_free_slots(slots)
+            received = 0
+            try:
+                streams = await redis_client.xreadgroup(
+                    CONSUMER_GROUP,
+                    CONSUMER_NAME,
+                    {STREAM_NAME: ">"},
+                    count=free,
+                    block=BLOCK_MS,
+                )
+                backoff = 1.0
+                if not streams:
+                    # 尝试认领超时未 ack 的 pending 消息（idle > VISIBILITY_MS，处理中的消息由心跳刷新）
+                    try:
+                        claimed = await redis_client.xautoclaim(
+                            STREAM_NAME, CONSUMER_GROUP, CONSUMER_NAME, min_idle_time=VISIBILITY_MS, start_id=_pending_start, count=free
+                        )
+                        if claimed and len(claimed) >= 2 and claimed[1]:
+                            msgs = claimed[1]
+                            _pending_start = claimed[0] or "0-0"
+                            logger.info("[LLMChatTask] 认领 %d 条 pending 消息", len(msgs))
+                            streams = [(STREAM_NAME, msgs)]
+                        else:
+                            _pending_start = "0-0"
+                    except Exception as claim_err:
+                        _pending_start = "0-0"
+                        logger.debug("[LLMChatTask] XAUTOCLAIM 无待认领消息或失败: %s", claim_err)
+                    if not streams:
+                        import time
+                        if time.time() - _last_log > 60:
+                            logger.info("[LLMChatTask] Worker 空闲等待中 stream=%s", STREAM_NAME)
+                            _last_log = time.time()
+                        continue
+                else:
+                    _pending_start = "0-0"
+
+                for stream_name, messages in streams:
+                    for msg_id, fields in messages:
+                        queue.put_nowait((msg_id, fields))
+                        received += 1
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception("Worker 消费异常: %s", e)
+                await asyncio.sleep(min(MAX_BACKOFF_SECONDS, backoff) * (0.5 + random.random()))
+                backoff = min(MAX_BACKOFF_SECONDS, backoff * 2)
+            finally:
+                # 未用上的名额归还；已入队消息的名额由消费者处理完后归还
+                for _ in range(free - received):
+                    slots.release()
+    finally:
+        for consumer in consumers:
+            consumer.cancel()
+        await redis_client.aclose()
+
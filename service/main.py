@@ -173,11 +173,21 @@ async def startup_event():
 
     migration_need, migration_cur, _ = needs_migration()
     if migration_need:
+        from scripts import _ledger
+        from scripts._migrate_runtime import close_pool, with_conn
+
         try:
+            # 数据库台账中源码（及其依赖）未变的迁移直接跳过（新容器无本地版本文件时也无需逐个重跑）
+            applied = await with_conn(_ledger.applied)
+            ledger_checksums = _ledger.checksums()
             for mod_name, fn_name in MIGRATIONS:
+                mod_checksum = ledger_checksums[mod_name]
+                if applied.get(mod_name) == mod_checksum:
+                    continue
                 mod = __import__(f"scripts.{mod_name}", fromlist=[fn_name])
                 fn = getattr(mod, fn_name)
                 await fn()
+                await with_conn(lambda conn: _ledger.mark(conn, mod_name, mod_checksum))
             write_applied_version(migration_cur)
             logger.info("RBAC / 菜单迁移已执行完成，版本: %s", migration_cur)
             # 迁移完成后清除菜单树和用户权限缓存
@@ -193,6 +203,9 @@ async def startup_event():
                 logger.warning(f"清除菜单树缓存失败（可忽略）: {cache_err}")
         except Exception as e:
             logger.exception(f"启动时执行 RBAC / 菜单迁移脚本失败: {e}")
+        finally:
+            # 迁移脚本共用的 asyncpg 连接池仅在启动迁移期间使用
+            await close_pool()
 
     # 初始化默认系统管理员账号（如不存在）
     await initialize_default_admin()
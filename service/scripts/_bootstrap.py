@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+脚本启动引导：单独运行 scripts/ 下的脚本时，将项目根目录（service/）加入 sys.path
+
+用法（脚本顶部）:
+    if not __package__:
+        import _bootstrap  # noqa: F401
+
+以包方式导入（如 main.py 中 __import__("scripts.xxx")）时项目根目录已在路径中，无需引导。
+"""
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
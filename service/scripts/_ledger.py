@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+迁移台账：schema_migrations 表记录已成功执行的迁移
+
+- 以 (模块名, 源码校验和) 为准：模块源码未变则跳过，修改过（如追加种子数据）则重新执行
+- 台账存于数据库，多实例/新容器共享，不依赖本地 .db_migration_version 文件
+- 启动时一次查询取回全部记录，已应用的迁移无需逐个探测 pg_catalog
+- 校验和叠加 MIGRATION_DEPENDENCIES 中依赖的校验和：依赖变化（如种子迁移新增权限）时依赖方（如回填迁移）随之重跑
+"""
+import hashlib
+import importlib
+from pathlib import Path
+from types import ModuleType
+from typing import Dict
+
+import asyncpg
+
+LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name TEXT PRIMARY KEY,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+
+def checksum(mod: ModuleType) -> str:
+    """迁移模块源码的校验和"""
+    return hashlib.sha256(Path(mod.__file__).read_bytes()).hexdigest()[:16]
+
+
+def checksums() -> Dict[str, str]:
+    """全部迁移的台账校验和：模块名 -> 模块源码校验和叠加其依赖的校验和（依赖须排在前面，见 MIGRATIONS）"""
+    from app.core.migration_config import MIGRATION_DEPENDENCIES, MIGRATIONS
+
+    result: Dict[str, str] = {}
+    for mod_name, _ in MIGRATIONS:
+        digest = hashlib.sha256(checksum(importlib.import_module(f"scripts.{mod_name}")).encode())
+        for dep in MIGRATION_DEPENDENCIES.get(mod_name, []):
+            digest.update(result[dep].encode())
+        result[mod_name] = digest.hexdigest()[:16]
+    return result
+
+
+async def applied(conn: asyncpg.Connection) -> Dict[str, str]:
+    """返回全部已应用迁移：模块名 -> 校验和（台账表不存在时先创建）"""
+    await conn.execute(LEDGER_DDL)
+    rows = await conn.fetch("SELECT name, checksum FROM schema_migrations")
+    return {row["name"]: row["checksum"] for row in rows}
+
+
+async def mark(conn: asyncpg.Connection, name: str, mod_checksum: str) -> None:
+    """记录迁移已成功执行"""
+    await conn.execute("""
+        INSERT INTO schema_migrations (name, checksum) VALUES ($1, $2)
+        ON CONFLICT (name) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = now()
+    """, name, mod_checksum)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+迁移脚本运行时：共享 asyncpg 连接池
+
+- 所有迁移脚本复用同一个连接池，避免每个脚本单独建连（认证、目录加载、JIT 预热）
+- 迁移函数以 @migration 装饰：调用方可传入已有连接，未传入时自动从共享池获取；
+  @migration(transactional=True) 使整个迁移在单个事务中执行
+- 单独运行脚本时使用 run_migration(fn)，结束后关闭连接池
+- 连接设置 lock_timeout：DDL 等锁超时即失败，不会无限期阻塞部署
+- 连接设置 statement_timeout：单条语句执行超时由服务端取消；并发索引构建不受此限制
+- 每个迁移在 application_name 中带上脚本名，pg_stat_activity 中可定位具体迁移
+"""
+import asyncio
+import functools
+import inspect
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import asyncpg
+
+from app.core.config import settings
+
+_pool: Optional[asyncpg.Pool] = None
+
+# 等锁上限：ALTER TABLE / CREATE INDEX 被其他事务阻塞时快速失败
+LOCK_TIMEOUT = "5s"
+# 单条语句执行上限（服务端）：卡住的迁移语句由 PostgreSQL 取消，不依赖客户端超时
+STATEMENT_TIMEOUT = "5min"
+# pg_stat_activity 中迁移连接的 application_name 前缀
+APPLICATION_NAME = "promptgenerate-migrations"
+
+
+async def get_pool() -> asyncpg.Pool:
+    """获取共享连接池（首次调用时创建）"""
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            database=settings.POSTGRES_DB,
+            min_size=1,
+            max_size=4,
+            # 不设 command_timeout：客户端超时会取消大表上的索引构建 / 数据回填，
+            # 并发索引构建被取消还会留下 INVALID 索引
+            server_settings={
+                # 迁移均为一次性短语句，关闭 JIT 避免首条语句的编译停顿
+                "jit": "off",
+                "lock_timeout": LOCK_TIMEOUT,
+                "statement_timeout": STATEMENT_TIMEOUT,
+                "application_name": APPLICATION_NAME,
+                # CREATE INDEX 排序以内存为主；池最多 4 个连接，取值需兼顾数据库内存
+                "maintenance_work_mem": "256MB",
+            },
+            # 语句缓存保持默认：纯 DDL 以无参数 conn.execute 执行，走简单查询协议，不经 Parse/缓存；
+            # 逐行 fetchval 的同一语句则可复用缓存的预编译语句
+        )
+    return _pool
+
+
+async def close_pool() -> None:
+    """关闭共享连接池"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def with_conn(
+    fn: Callable[[asyncpg.Connection], Awaitable[Any]],
+    name: Optional[str] = None,
+) -> Any:
+    """
+    从共享连接池取一个连接执行 fn(conn)
+
+    传入 name 时将连接的 application_name 设为 "<前缀>:<name>"；
+    连接归还连接池时 RESET ALL 恢复为池默认值
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        if name is not None:
+            await conn.execute(
+                "SELECT set_config('application_name', $1, false)",
+                f"{APPLICATION_NAME}:{name}",
+            )
+        return await fn(conn)
+
+
+async def create_index_concurrently(conn: asyncpg.Connection, index_name: str, sql: str) -> None:
+    """
+    以 CONCURRENTLY 在线创建索引（须在事务外调用）
+
+    CONCURRENTLY 构建中途失败会留下 INVALID 索引，IF NOT EXISTS 会将其当作已存在而跳过；
+    先查 pg_index.indisvalid，无效索引以 DROP INDEX CONCURRENTLY 删除后再执行 sql 重建；
+    执行后再次确认索引有效，否则抛出 RuntimeError，调用方不会在无效索引上继续替换约束/索引。
+    大表上的构建可能超过 statement_timeout，构建期间在本会话内取消该限制；
+    并发构建幂等、失败可重建，同时关闭 synchronous_commit（台账等其他写入仍同步提交）。
+    """
+    invalid = await conn.fetchval(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)",
+        index_name,
+    )
+    await conn.execute("SET statement_timeout = 0; SET synchronous_commit = off")
+    try:
+        if invalid:
+            print(f"⚠️  索引 {index_name} 无效（上次并发构建未完成），删除后重建")
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+        await conn.execute(sql)
+    finally:
+        await conn.execute("RESET statement_timeout; RESET synchronous_commit")
+    valid = await conn.fetchval(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)",
+        index_name,
+    )
+    if not valid:
+        raise RuntimeError(f"索引 {index_name} 构建后不存在或无效")
+
+
+def migration(
+    fn: Optional[Callable[[asyncpg.Connection], Awaitable[Any]]] = None,
+    *,
+    transactional: bool = False,
+) -> Any:
+    """
+    迁移函数装饰器
+
+    被装饰函数签名为 fn(conn)；调用时 conn 可省略，此时从共享连接池获取。
+    transactional=True 时整个迁移在一个事务内执行（仅一次提交 / WAL 刷盘），
+    不适用于包含 CREATE INDEX CONCURRENTLY 等不能在事务中执行的语句的迁移。
+    等锁超时 / 语句取消时输出迁移名后重新抛出，事务整体回滚。
+    """
+    def decorator(f: Callable[[asyncpg.Connection], Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        # 以脚本文件名标识迁移（单独运行时 __module__ 为 __main__）
+        name = Path(inspect.getfile(f)).stem
+
+        async def execute(conn: asyncpg.Connection) -> Any:
+            if not transactional:
+                return await f(conn)
+            async with conn.transaction():
+                return await f(conn)
+
+        async def run(conn: asyncpg.Connection) -> Any:
+            try:
+                return await execute(conn)
+            except asyncpg.exceptions.LockNotAvailableError as e:
+                print(f"❌ 迁移 {f.__name__} 等锁超时（lock_timeout={LOCK_TIMEOUT}），可稍后重试: {e}")
+                raise
+            except asyncpg.exceptions.QueryCanceledError as e:
+                print(f"❌ 迁移 {f.__name__} 语句被取消（statement_timeout={STATEMENT_TIMEOUT}）: {e}")
+                raise
+
+        @functools.wraps(f)
+        async def wrapper(conn: Optional[asyncpg.Connection] = None) -> Any:
+            if conn is not None:
+                return await run(conn)
+            return await with_conn(run, name)
+
+        return wrapper
+
+    if fn is not None:
+        return decorator(fn)
+    return decorator
+
+
+def run_migration(fn: Callable[..., Awaitable[Any]]) -> Any:
+    """单独运行迁移脚本的入口：执行 fn() 后关闭连接池"""
+    async def _main() -> Any:
+        try:
+            return await fn()
+        finally:
+            await close_pool()
+
+    return asyncio.run(_main())
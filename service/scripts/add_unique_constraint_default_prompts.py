@@ -5,25 +5,16 @@
 """
 import asyncio
 import asyncpg
-import sys
-import os
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def add_unique_constraint():
+@migration
+async def add_unique_constraint(conn: asyncpg.Connection):
     """添加唯一性约束"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         print("\n开始添加唯一性约束...")
         print("=" * 80)
@@ -128,9 +119,9 @@ async def add_unique_constraint():
             DELETE FROM prompts WHERE scene = $1
         """, test_scene)
         print(f"   ✅ 已清理测试数据")
-        
-    finally:
-        await conn.close()
+    except Exception as e:
+        print(f"❌ 添加唯一性约束失败: {e}")
+        raise
 
 
 async def main():
@@ -139,4 +130,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
@@ -14,10 +14,9 @@
 import asyncio
 import os
 import sys
-from pathlib import Path
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 
 def main():
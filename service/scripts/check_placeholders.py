@@ -3,12 +3,9 @@
 检查占位符数据，分析重复情况
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
 from app.core.config import settings
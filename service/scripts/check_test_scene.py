@@ -3,12 +3,9 @@
 查询 test 场景的提示词
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.database import AsyncSessionLocal, init_db
 from app.models.prompt import Prompt
@@ -6,11 +6,10 @@
 import asyncio
 import asyncpg
 import sys
-import os
 import uuid
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.config import settings
 from app.core.security import get_password_hash
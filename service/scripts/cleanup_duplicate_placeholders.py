@@ -4,12 +4,9 @@
 保留标准格式的占位符（优先全局占位符 scene=""，其次按创建时间取最新）
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
 from app.core.config import settings
@@ -6,10 +6,9 @@
 import asyncio
 import asyncpg
 import sys
-import os
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.config import settings
 
@@ -3,13 +3,10 @@
 清除占位符缓存
 """
 import asyncio
-import sys
-from pathlib import Path
 import redis.asyncio as redis
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.config import settings
 import os
@@ -2,26 +2,16 @@
 """
 修复 llm_models 表的 config 列
 """
-import asyncio
-import sys
-from pathlib import Path
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def fix():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def fix(conn: asyncpg.Connection):
     try:
         # 检查 llm_models 表的列名
         columns = await conn.fetch("""
@@ -42,9 +32,10 @@ async def fix():
             print('✅ 添加 config 列')
         else:
             print('\n✅ config 列已存在')
-    finally:
-        await conn.close()
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        raise
 
 
 if __name__ == "__main__":
-    asyncio.run(fix())
+    run_migration(fix)
@@ -2,17 +2,12 @@
 """
 添加配置中心菜单权限及其子菜单（场景配置、占位符配置、多维表格）
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 配置中心菜单权限（父菜单）
@@ -29,75 +24,69 @@ CONFIG_MENU_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """插入配置中心菜单权限（支持父子关系）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
-        # 先创建父菜单，再创建子菜单
+        parents = [p for p in CONFIG_MENU_PERMISSIONS if p[5] is None]
+        children = [p for p in CONFIG_MENU_PERMISSIONS if p[5] is not None]
+
+        # 第一遍：创建/更新父菜单，RETURNING id 直接得到实际 ID（新插入或已存在），无需再按 code 回查
         parent_id_map = {}  # code -> id 映射
-        
-        # 第一遍：创建所有菜单权限（先创建父菜单）
-        for code, name, resource, action, description, parent_code, sort_order in CONFIG_MENU_PERMISSIONS:
-            if parent_code is None:
-                # 父菜单
-                pid = str(uuid.uuid4())
-                await conn.execute("""
-                    INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, 'menu', $6, NULL, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                    ON CONFLICT (code) DO UPDATE
-                    SET name = EXCLUDED.name,
-                        description = EXCLUDED.description,
-                        sort_order = EXCLUDED.sort_order,
-                        updated_at = CURRENT_TIMESTAMP
-                """, pid, name, code, resource, action, description or "", sort_order)
-                
-                # 获取实际插入的 ID（如果已存在，则查询）
-                actual_id = await conn.fetchval("SELECT id FROM permissions WHERE code = $1", code)
-                parent_id_map[code] = actual_id
-                print(f"✅ 创建/更新父菜单: {name} ({code})")
-        
-        # 第二遍：创建子菜单（使用父菜单的 ID）
+        for code, name, resource, action, description, _, sort_order in parents:
+            parent_id_map[code] = await conn.fetchval("""
+                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+                VALUES (gen_random_uuid()::text, $1, $2, $3, $4, 'menu', $5, NULL, $6, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT (code) DO UPDATE
+                SET name = EXCLUDED.name,
+                    description = EXCLUDED.description,
+                    sort_order = EXCLUDED.sort_order,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING id
+            """, name, code, resource, action, description or "", sort_order)
+            print(f"✅ 创建/更新父菜单: {name} ({code})")
+
+        # 第二遍：批量创建子菜单（使用父菜单的 ID）
         # 若 menu:tables:list 已存在（多维表格已迁移为独立菜单），则跳过 menu:config:tables，避免 name 重复
-        tables_list_exists = await conn.fetchval("SELECT id FROM permissions WHERE code = 'menu:tables:list'")
-        for code, name, resource, action, description, parent_code, sort_order in CONFIG_MENU_PERMISSIONS:
-            if parent_code is not None:
-                if code == "menu:config:tables" and tables_list_exists:
-                    print(f"⏭️  跳过 menu:config:tables（多维表格已迁移为独立菜单 menu:tables:list）")
-                    continue
-                # 子菜单
-                parent_id = parent_id_map.get(parent_code)
-                if not parent_id:
-                    print(f"⚠️  警告: 找不到父菜单 {parent_code}，跳过子菜单 {code}")
-                    continue
-                
-                pid = str(uuid.uuid4())
-                await conn.execute("""
-                    INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, 'menu', $6, $7, $8, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                    ON CONFLICT (code) DO UPDATE
-                    SET name = EXCLUDED.name,
-                        description = EXCLUDED.description,
-                        parent_id = EXCLUDED.parent_id,
-                        sort_order = EXCLUDED.sort_order,
-                        updated_at = CURRENT_TIMESTAMP
-                """, pid, name, code, resource, action, description or "", parent_id, sort_order)
+        # 子菜单引用的其余父菜单与 menu:tables:list 一次查询取回
+        codes_needed = ({p[5] for p in children} | {"menu:tables:list"}) - parent_id_map.keys()
+        rows = await conn.fetch(
+            "SELECT code, id FROM permissions WHERE code = ANY($1::text[])",
+            list(codes_needed),
+        )
+        parent_id_map.update({r["code"]: r["id"] for r in rows})
+        tables_list_exists = "menu:tables:list" in parent_id_map
+        child_rows = []
+        for code, name, resource, action, description, parent_code, sort_order in children:
+            if code == "menu:config:tables" and tables_list_exists:
+                print(f"⏭️  跳过 menu:config:tables（多维表格已迁移为独立菜单 menu:tables:list）")
+                continue
+            parent_id = parent_id_map.get(parent_code)
+            if not parent_id:
+                print(f"⚠️  警告: 找不到父菜单 {parent_code}，跳过子菜单 {code}")
+                continue
+            child_rows.append((name, code, resource, action, description or "", parent_id, sort_order))
+
+        if child_rows:
+            await conn.executemany("""
+                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+                VALUES (gen_random_uuid()::text, $1, $2, $3, $4, 'menu', $5, $6, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT (code) DO UPDATE
+                SET name = EXCLUDED.name,
+                    description = EXCLUDED.description,
+                    parent_id = EXCLUDED.parent_id,
+                    sort_order = EXCLUDED.sort_order,
+                    updated_at = CURRENT_TIMESTAMP
+            """, child_rows)
+            for name, code, *_ in child_rows:
                 print(f"✅ 创建/更新子菜单: {name} ({code})")
-        
+
         print(f"✅ 配置中心菜单权限已写入（共 {len(CONFIG_MENU_PERMISSIONS)} 条）")
 
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -3,34 +3,23 @@
 添加 LLM 模型管理和会话记录功能
 创建 llm_models、conversations、conversation_messages 表
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """
     创建 LLM 模型管理和会话记录相关的表
     """
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
-        # 1. 创建 llm_models 表
+        # 三张表及其索引合并为一个多语句脚本，一次往返完成全部 DDL
         await conn.execute("""
+            -- 1. llm_models 表
             CREATE TABLE IF NOT EXISTS llm_models (
                 id VARCHAR PRIMARY KEY,
                 name VARCHAR(255) NOT NULL,
@@ -48,17 +37,11 @@ async def migrate():
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
             );
-        """)
-        
-        # 创建索引
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_models_team_id ON llm_models(team_id);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_models_is_active ON llm_models(is_active);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_models_is_default ON llm_models(is_default);")
-        
-        print("✅ 创建 llm_models 表成功")
-        
-        # 2. 创建 conversations 表
-        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_models_team_id ON llm_models(team_id);
+            CREATE INDEX IF NOT EXISTS idx_llm_models_is_active ON llm_models(is_active);
+            CREATE INDEX IF NOT EXISTS idx_llm_models_is_default ON llm_models(is_default);
+
+            -- 2. conversations 表
             CREATE TABLE IF NOT EXISTS conversations (
                 id VARCHAR PRIMARY KEY,
                 scene VARCHAR(100) NOT NULL,
@@ -69,18 +52,12 @@ async def migrate():
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL,
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
             );
-        """)
-        
-        # 创建索引
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_team_id ON conversations(team_id);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_scene ON conversations(scene);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_tenant_id ON conversations(tenant_id);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC);")
-        
-        print("✅ 创建 conversations 表成功")
-        
-        # 3. 创建 conversation_messages 表
-        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_conversations_team_id ON conversations(team_id);
+            CREATE INDEX IF NOT EXISTS idx_conversations_scene ON conversations(scene);
+            CREATE INDEX IF NOT EXISTS idx_conversations_tenant_id ON conversations(tenant_id);
+            CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC);
+
+            -- 3. conversation_messages 表
             CREATE TABLE IF NOT EXISTS conversation_messages (
                 id VARCHAR PRIMARY KEY,
                 conversation_id VARCHAR NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
@@ -89,12 +66,12 @@ async def migrate():
                 metadata TEXT,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
             );
+            CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation_id ON conversation_messages(conversation_id);
+            CREATE INDEX IF NOT EXISTS idx_conversation_messages_created_at ON conversation_messages(created_at);
         """)
-        
-        # 创建索引
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation_id ON conversation_messages(conversation_id);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_messages_created_at ON conversation_messages(created_at);")
-        
+
+        print("✅ 创建 llm_models 表成功")
+        print("✅ 创建 conversations 表成功")
         print("✅ 创建 conversation_messages 表成功")
         
         print("\n✨ 迁移完成！")
@@ -102,9 +79,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
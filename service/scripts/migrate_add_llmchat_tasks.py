@@ -2,25 +2,16 @@
 """
 创建 llmchat_tasks 表（异步任务结果存储）
 """
-import asyncio
-import sys
-from pathlib import Path
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS llmchat_tasks (
@@ -37,17 +28,15 @@ async def migrate():
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 completed_at TIMESTAMP WITH TIME ZONE
             );
+            CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_status ON llmchat_tasks(status);
+            CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_team_id ON llmchat_tasks(team_id);
+            CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_created_at ON llmchat_tasks(created_at);
         """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_status ON llmchat_tasks(status);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_team_id ON llmchat_tasks(team_id);")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llmchat_tasks_created_at ON llmchat_tasks(created_at);")
         print("✅ llmchat_tasks 表创建成功")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -4,18 +4,13 @@
 对应 app/routers/admin/mcp.py 中的权限检查
 使用 require_team_admin_or_superuser，无需单独 API 权限，但为角色分配时可选择
 """
-import asyncio
-import sys
-import uuid
-from pathlib import Path
 
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 # MCP 接口权限（用于角色分配时可选）
 # 注：当前 MCP 路由使用 require_team_admin_or_superuser，团队管理员及以上即可访问
@@ -29,34 +24,23 @@ API_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """插入 MCP 接口权限"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
-        inserted = 0
-        for code, name, resource, action, description in API_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            result = await conn.execute(
-                """
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'api', $6, NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-                """,
-                pid,
-                name,
-                code,
-                resource,
-                action,
-                description or "",
-            )
-            if result == "INSERT 0 1":
-                inserted += 1
+        # 各列以并行数组传入，服务端 unnest 展开为多行一次写入；RETURNING code 只返回实际新增的行
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*API_PERMISSIONS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'api', COALESCE(t.description, ''), NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[]) AS t(code, name, resource, action, description)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions)
+        inserted_codes = {r["code"] for r in returned}
+        inserted = len(inserted_codes)
+        for code, name, *_ in API_PERMISSIONS:
+            if code in inserted_codes:
                 print(f"✅ 创建权限: {name} ({code})")
             else:
                 print(f"⏭️  权限已存在，跳过: {name} ({code})")
@@ -64,9 +48,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
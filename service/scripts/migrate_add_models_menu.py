@@ -2,17 +2,12 @@
 """
 添加模型管理菜单权限
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 模型管理菜单权限
@@ -21,16 +16,9 @@ MODELS_MENU_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """插入模型管理菜单权限"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
         # 获取父菜单 ID
         parent_id = await conn.fetchval("SELECT id FROM permissions WHERE code = 'menu:config'")
@@ -38,44 +26,37 @@ async def migrate():
             print("❌ 找不到父菜单 menu:config，请先运行 migrate_add_config_menu.py")
             return
         
+        perm_sql = """
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            VALUES (gen_random_uuid()::text, $1, $2, $3, $4, 'menu', $5, $6, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT (code) DO UPDATE
+            SET name = EXCLUDED.name,
+                description = EXCLUDED.description,
+                sort_order = EXCLUDED.sort_order,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING id
+        """
+        config_sql = """
+            INSERT INTO menu_configs (id, permission_id, team_id, parent_id, sort_order, created_at, updated_at)
+            VALUES (gen_random_uuid()::text, $1, NULL, $2, $3, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT (permission_id) WHERE team_id IS NULL DO UPDATE
+            SET parent_id = EXCLUDED.parent_id,
+                sort_order = EXCLUDED.sort_order,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING (xmax = 0)
+        """
+
         # 创建子菜单
         for code, name, resource, action, description, parent_code, sort_order in MODELS_MENU_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'menu', $6, $7, $8, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO UPDATE
-                SET name = EXCLUDED.name,
-                    description = EXCLUDED.description,
-                    sort_order = EXCLUDED.sort_order,
-                    updated_at = CURRENT_TIMESTAMP
-            """, pid, name, code, resource, action, description or "", parent_id, sort_order)
+            # RETURNING id 返回实际菜单 ID（新插入或已存在）
+            actual_menu_id = await conn.fetchval(perm_sql, name, code, resource, action, description or "", parent_id, sort_order)
             print(f"✅ 创建/更新菜单: {name} ({code})")
             
-            # 获取实际插入的菜单 ID（如果已存在，则查询）
-            actual_menu_id = await conn.fetchval("SELECT id FROM permissions WHERE code = $1", code)
-            
-            # 创建菜单配置（MenuConfig），用于菜单树显示
-            # 检查是否已存在配置
-            existing_config = await conn.fetchrow(
-                "SELECT id FROM menu_configs WHERE permission_id = $1 AND team_id IS NULL",
-                actual_menu_id
-            )
-            
-            if not existing_config:
-                config_id = str(uuid.uuid4())
-                await conn.execute("""
-                    INSERT INTO menu_configs (id, permission_id, team_id, parent_id, sort_order, created_at, updated_at)
-                    VALUES ($1, $2, NULL, $3, $4, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                """, config_id, actual_menu_id, parent_id, sort_order)
+            # 创建/更新菜单配置（MenuConfig），用于菜单树显示；单条 upsert，xmax = 0 表示新插入
+            inserted = await conn.fetchval(config_sql, actual_menu_id, parent_id, sort_order)
+            if inserted:
                 print(f"✅ 创建菜单配置: {name} (MenuConfig)")
             else:
-                # 更新现有配置
-                await conn.execute("""
-                    UPDATE menu_configs
-                    SET parent_id = $1, sort_order = $2, updated_at = CURRENT_TIMESTAMP
-                    WHERE permission_id = $3 AND team_id IS NULL
-                """, parent_id, sort_order, actual_menu_id)
                 print(f"✅ 更新菜单配置: {name} (MenuConfig)")
         
         print("\n✨ 迁移完成！")
@@ -83,9 +64,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,17 +2,13 @@
 """
 添加通知中心 API 权限（config:notification:list, config:notification:update）及按钮权限
 """
-import asyncio
-import sys
-import uuid
-from pathlib import Path
 
 import asyncpg
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 # 接口权限
 API_PERMISSIONS = [
@@ -25,51 +21,40 @@ BUTTON_PERMISSIONS = [
 ]
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     try:
         menu_id = await conn.fetchval("SELECT id FROM permissions WHERE code = 'menu:config:notification'")
         if not menu_id:
             print("❌ 找不到 menu:config:notification，请先运行 migrate_add_notification_menu.py")
             return
 
-        for code, name, resource, action, description in API_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            await conn.execute(
-                """
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'api', $6, NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-                """,
-                pid, name, code, resource, action, description or "",
-            )
+        # API 与按钮权限合并为一批（每行自带 type、parent_id），executemany 一次流水线写入
+        rows = [
+            (name, code, resource, action, "api", description or "", None)
+            for code, name, resource, action, description in API_PERMISSIONS
+        ] + [
+            (name, code, resource, action, "button", description or "", menu_id)
+            for code, name, resource, action, description in BUTTON_PERMISSIONS
+        ]
+        await conn.executemany(
+            """
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            VALUES (gen_random_uuid()::text, $1, $2, $3, $4, $5, $6, $7, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT (code) DO NOTHING
+            """,
+            rows,
+        )
+        for code, name, *_ in API_PERMISSIONS:
             print(f"✅ API 权限: {name} ({code})")
-
-        for code, name, resource, action, description in BUTTON_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            await conn.execute(
-                """
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'button', $6, $7, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-                """,
-                pid, name, code, resource, action, description or "", menu_id,
-            )
+        for code, name, *_ in BUTTON_PERMISSIONS:
             print(f"✅ 按钮权限: {name} ({code})")
 
         print("✅ 通知中心权限迁移完成")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
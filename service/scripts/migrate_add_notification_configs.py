@@ -2,25 +2,16 @@
 """
 创建 notification_configs 表
 """
-import asyncio
-import sys
-from pathlib import Path
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS notification_configs (
@@ -40,9 +31,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,17 +2,12 @@
 """
 添加通知中心菜单权限（menu:config:notification）
 """
-import asyncio
-import sys
-import uuid
-from pathlib import Path
-
 import asyncpg
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 NOTIFICATION_MENU = (
     "menu:config:notification",
@@ -25,39 +20,36 @@ NOTIFICATION_MENU = (
 )
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         code, name, resource, action, description, parent_code, sort_order = NOTIFICATION_MENU
-        parent_id = await conn.fetchval("SELECT id FROM permissions WHERE code = $1", parent_code)
-        if not parent_id:
-            print("❌ 找不到父菜单 menu:config，请先运行 migrate_add_config_menu.py")
-            return
-
-        pid = str(uuid.uuid4())
-        await conn.execute(
+        # 父菜单查找内嵌为 CTE，整个迁移只解析/规划一条语句；父菜单不存在时不插入任何数据
+        row = await conn.fetchrow(
             """
+            WITH parent AS (SELECT id FROM permissions WHERE code = $6)
             INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-            VALUES ($1, $2, $3, $4, $5, 'menu', $6, $7, $8, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            SELECT gen_random_uuid()::text, $1, $2, $3, $4, 'menu', $5, parent.id, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM parent
             ON CONFLICT (code) DO UPDATE
             SET name = EXCLUDED.name, description = EXCLUDED.description,
                 parent_id = EXCLUDED.parent_id, sort_order = EXCLUDED.sort_order, updated_at = CURRENT_TIMESTAMP
+            RETURNING id, (xmax = 0) AS inserted
             """,
-            pid, name, code, resource, action, description or "", parent_id, sort_order,
+            name, code, resource, action, description or "", parent_code, sort_order,
         )
-        print(f"✅ 创建/更新通知中心菜单: {name} ({code})")
+        if row is None:
+            print("❌ 找不到父菜单 menu:config，请先运行 migrate_add_config_menu.py")
+            return
+        # xmax = 0 表示本次新插入，否则为冲突后更新
+        if row["inserted"]:
+            print(f"✅ 创建通知中心菜单: {name} ({code})")
+        else:
+            print(f"✅ 更新通知中心菜单: {name} ({code})")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,77 +2,51 @@
 """
 为通知中心菜单添加 MenuConfig，确保在配置中心正确显示
 """
-import asyncio
-import sys
-import uuid
-from pathlib import Path
-
 import asyncpg
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 NOTIFICATION_MENU_CODE = "menu:config:notification"
 PARENT_CODE = "menu:config"
 SORT_ORDER = 106
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     try:
-        parent_id = await conn.fetchval("SELECT id FROM permissions WHERE code = $1", PARENT_CODE)
-        if not parent_id:
-            print("❌ 找不到父菜单 menu:config")
-            return
-
-        menu_id = await conn.fetchval("SELECT id FROM permissions WHERE code = $1", NOTIFICATION_MENU_CODE)
-        if not menu_id:
-            print("❌ 找不到通知中心菜单，请先运行 migrate_add_notification_menu.py")
-            return
-
-        existing = await conn.fetchrow(
-            "SELECT id FROM menu_configs WHERE permission_id = $1 AND team_id IS NULL",
-            menu_id,
-        )
-        if not existing:
-            config_id = str(uuid.uuid4())
-            await conn.execute(
-                """
-                INSERT INTO menu_configs (id, permission_id, team_id, parent_id, sort_order, created_at, updated_at)
-                VALUES ($1, $2, NULL, $3, $4, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                """,
-                config_id,
-                menu_id,
-                parent_id,
-                SORT_ORDER,
+        # 父菜单、通知中心菜单的查找与 upsert 合并为一条语句；任一菜单不存在时不写入，返回 NULL
+        # 冲突目标为全局配置的部分唯一索引 uq_menu_configs_perm_global（team_id IS NULL，由 migrate_menu_configs_global_unique 创建）
+        inserted = await conn.fetchval(
+            """
+            WITH ids AS (
+                SELECT (SELECT id FROM permissions WHERE code = $1) AS parent_id,
+                       (SELECT id FROM permissions WHERE code = $2) AS menu_id
             )
+            INSERT INTO menu_configs (id, permission_id, team_id, parent_id, sort_order, created_at, updated_at)
+            SELECT gen_random_uuid()::text, menu_id, NULL, parent_id, $3, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM ids
+            WHERE menu_id IS NOT NULL AND parent_id IS NOT NULL
+            ON CONFLICT (permission_id) WHERE team_id IS NULL DO UPDATE
+            SET parent_id = EXCLUDED.parent_id, sort_order = EXCLUDED.sort_order, updated_at = CURRENT_TIMESTAMP
+            RETURNING (xmax = 0)
+            """,
+            PARENT_CODE,
+            NOTIFICATION_MENU_CODE,
+            SORT_ORDER,
+        )
+        if inserted is None:
+            print("❌ 找不到父菜单 menu:config 或通知中心菜单，请先运行 migrate_add_notification_menu.py")
+        elif inserted:
             print("✅ 创建通知中心菜单配置 (MenuConfig)")
         else:
-            await conn.execute(
-                """
-                UPDATE menu_configs
-                SET parent_id = $1, sort_order = $2, updated_at = CURRENT_TIMESTAMP
-                WHERE permission_id = $3 AND team_id IS NULL
-                """,
-                parent_id,
-                SORT_ORDER,
-                menu_id,
-            )
             print("✅ 更新通知中心菜单配置 (MenuConfig)")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
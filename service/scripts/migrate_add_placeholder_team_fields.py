@@ -2,89 +2,68 @@
 """
 迁移脚本：为占位符表添加团队字段并修改唯一约束
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+# 字段与约束步骤合并为一个服务端幂等脚本，一次往返执行：
+# 1. 添加 team_code、team_id 字段；2. 删除旧的 key 唯一约束；
+# 3. 添加 team_id 外键与 (team_id, key) 唯一约束（ADD CONSTRAINT 不支持 IF NOT EXISTS，
+#    在同一个 DO 块中忽略已存在的约束）
+PLACEHOLDER_TEAM_DDL = """
+    ALTER TABLE placeholders
+        ADD COLUMN IF NOT EXISTS team_code VARCHAR,
+        ADD COLUMN IF NOT EXISTS team_id VARCHAR;
+
+    ALTER TABLE placeholders DROP CONSTRAINT IF EXISTS placeholders_key_key;
+
+    DO $$
+    BEGIN
+        BEGIN
+            ALTER TABLE placeholders
+            ADD CONSTRAINT placeholders_team_id_fkey
+            FOREIGN KEY (team_id) REFERENCES teams(id);
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END;
+
+        BEGIN
+            ALTER TABLE placeholders
+            ADD CONSTRAINT uq_placeholder_team_key
+            UNIQUE (team_id, key);
+        EXCEPTION WHEN duplicate_table OR duplicate_object THEN NULL;
+        END;
+    END $$;
+"""
+
+# 索引：(索引名, 语句)。以 CONCURRENTLY 在线创建，不阻塞 placeholders 写入；不能在事务块中执行，须逐条单独发送
+PLACEHOLDER_TEAM_INDEXES = [
+    ("ix_placeholders_team_code",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_placeholders_team_code ON placeholders(team_code)"),
+    ("ix_placeholders_team_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_placeholders_team_id ON placeholders(team_id)"),
+]
+
+
+@migration
+async def migrate(conn: asyncpg.Connection):
     """执行迁移"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
-        # 1. 添加 team_code 和 team_id 字段（如果不存在）
-        print("添加 team_code 和 team_id 字段...")
-        await conn.execute("""
-            ALTER TABLE placeholders 
-            ADD COLUMN IF NOT EXISTS team_code VARCHAR,
-            ADD COLUMN IF NOT EXISTS team_id VARCHAR;
-        """)
-        
-        # 2. 添加 team_id 外键约束（如果不存在）
-        print("添加 team_id 外键约束...")
-        # 检查外键是否已存在
-        check_fk = await conn.fetchval("""
-            SELECT COUNT(*) 
-            FROM information_schema.table_constraints 
-            WHERE constraint_name = 'placeholders_team_id_fkey' 
-            AND table_name = 'placeholders';
-        """)
-        if check_fk == 0:
-            await conn.execute("""
-                ALTER TABLE placeholders 
-                ADD CONSTRAINT placeholders_team_id_fkey 
-                FOREIGN KEY (team_id) REFERENCES teams(id);
-            """)
+        print("添加团队字段并替换 key 唯一约束为 (team_id, key)...")
+        # 无参数多语句脚本走简单查询协议，服务端将其作为一个隐式事务执行，无需额外 BEGIN/COMMIT 往返
+        await conn.execute(PLACEHOLDER_TEAM_DDL)
         
-        # 3. 创建索引（如果不存在）
         print("创建 team_code 和 team_id 索引...")
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS ix_placeholders_team_code ON placeholders(team_code);
-            CREATE INDEX IF NOT EXISTS ix_placeholders_team_id ON placeholders(team_id);
-        """)
-        
-        # 4. 删除旧的 key 唯一约束（如果存在）
-        print("删除旧的 key 唯一约束...")
-        await conn.execute("""
-            DO $$
-            BEGIN
-                IF EXISTS (
-                    SELECT 1 FROM pg_constraint 
-                    WHERE conname = 'placeholders_key_key'
-                ) THEN
-                    ALTER TABLE placeholders DROP CONSTRAINT placeholders_key_key;
-                END IF;
-            END $$;
-        """)
-        
-        # 5. 添加新的 (team_id, key) 唯一约束
-        print("添加 (team_id, key) 唯一约束...")
-        await conn.execute("""
-            DO $$
-            BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 FROM pg_constraint 
-                    WHERE conname = 'uq_placeholder_team_key'
-                ) THEN
-                    ALTER TABLE placeholders 
-                    ADD CONSTRAINT uq_placeholder_team_key 
-                    UNIQUE (team_id, key);
-                END IF;
-            END $$;
-        """)
-        
+        for index_name, sql in PLACEHOLDER_TEAM_INDEXES:
+            await create_index_concurrently(conn, index_name, sql)
         print("迁移完成！")
     except Exception as e:
         print(f"迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
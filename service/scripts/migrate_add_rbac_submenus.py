@@ -5,10 +5,12 @@
 - 用户权限分配 (menu:rbac:user_roles:list)
 - 菜单管理 (menu:rbac:menus:list)
 """
-import asyncio
-import uuid
 import asyncpg
-from app.core.config import settings
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 权限管理子菜单权限：(code, name, resource, action, description)
@@ -20,15 +22,9 @@ RBAC_SUBMENUS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """插入权限管理子菜单权限（type=menu，code 已存在则跳过）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
         # 获取权限管理父菜单的 ID
         parent_menu_id = await conn.fetchval("""
@@ -39,17 +35,22 @@ async def migrate():
             print("⚠️  未找到权限管理父菜单 (menu:rbac)，跳过创建子菜单")
             return
         
-        inserted = 0
-        for idx, (code, name, resource, action, description) in enumerate(RBAC_SUBMENUS):
-            pid = str(uuid.uuid4())
-            sort_order = idx + 1
-            result = await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'menu', $6, $7, $8, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-            """, pid, name, code, resource, action, description or "", parent_menu_id, sort_order)
-            if result == "INSERT 0 1":
-                inserted += 1
+        # 各列以并行数组传入，服务端 unnest 展开为多行一次写入；sort_order 取数组序号（WITH ORDINALITY）
+        # RETURNING code 只返回实际新增的行，据此输出新增/跳过
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*RBAC_SUBMENUS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'menu', COALESCE(t.description, ''), $1, t.ord, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($2::text[], $3::text[], $4::text[], $5::text[], $6::text[])
+                WITH ORDINALITY AS t(code, name, resource, action, description, ord)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, parent_menu_id, codes, names, resources, actions, descriptions)
+        inserted_codes = {r["code"] for r in returned}
+        inserted = len(inserted_codes)
+        
+        for code, name, *_ in RBAC_SUBMENUS:
+            if code in inserted_codes:
                 print(f"✅ 创建子菜单权限: {name} ({code})")
             else:
                 print(f"⏭️  子菜单权限已存在，跳过: {name} ({code})")
@@ -58,9 +59,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
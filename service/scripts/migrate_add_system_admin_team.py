@@ -2,12 +2,9 @@
 迁移脚本：添加系统管理员团队标识字段
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到路径
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from sqlalchemy import text
 from app.core.database import AsyncSessionLocal
@@ -2,34 +2,23 @@
 """
 为多维表格添加 code 字段
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """为多维表格表添加 code 字段"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
-        # 1. 检查是否已有 code 列
+        # 1. 检查是否已有 code 列（直接查 pg_attribute，不经 information_schema 视图）
         col = await conn.fetchval("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_name = 'multi_dimension_tables' AND column_name = 'code'
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = 'multi_dimension_tables'::regclass
+              AND attname = 'code' AND attnum > 0 AND NOT attisdropped
         """)
         
         if not col:
@@ -41,15 +30,13 @@ async def migrate():
             print("✅ code 列已添加")
             
             # 3. 为现有数据生成 code
-            tables = await conn.fetch("SELECT id FROM multi_dimension_tables WHERE code IS NULL")
-            for table in tables:
-                table_code = f"table_{table['id'][:8]}"
-                await conn.execute("""
-                    UPDATE multi_dimension_tables 
-                    SET code = $1 
-                    WHERE id = $2
-                """, table_code, table['id'])
-            print(f"✅ 已为 {len(tables)} 条现有数据生成 code")
+            # code 由 id 前 8 位拼接而成，纯 SQL 表达式，一条 UPDATE 在服务端完成全部行
+            result = await conn.execute("""
+                UPDATE multi_dimension_tables 
+                SET code = 'table_' || substr(id::text, 1, 8) 
+                WHERE code IS NULL
+            """)
+            print(f"✅ 已为 {result.split()[-1]} 条现有数据生成 code")
             
             # 4. 设置 code 列为 NOT NULL 和 UNIQUE
             await conn.execute("""
@@ -69,9 +56,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -3,10 +3,12 @@
 添加多维表格的 API 权限（type=api）
 对应 app/routers/admin/multi_dimension_tables.py 中的权限检查
 """
-import asyncio
-import uuid
 import asyncpg
-from app.core.config import settings
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 多维表格接口权限种子：(code, name, resource, action, description)
@@ -19,26 +21,23 @@ API_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """插入多维表格接口权限（type=api，code 已存在则跳过）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
-        inserted = 0
-        for code, name, resource, action, description in API_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            result = await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'api', $6, NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-            """, pid, name, code, resource, action, description or "")
-            if result == "INSERT 0 1":
-                inserted += 1
+        # 各列以并行数组传入，服务端 unnest 展开为多行一次写入；RETURNING code 只返回实际新增的行
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*API_PERMISSIONS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'api', COALESCE(t.description, ''), NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[]) AS t(code, name, resource, action, description)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions)
+        inserted_codes = {r["code"] for r in returned}
+        inserted = len(inserted_codes)
+        for code, name, *_ in API_PERMISSIONS:
+            if code in inserted_codes:
                 print(f"✅ 创建权限: {name} ({code})")
             else:
                 print(f"⏭️  权限已存在，跳过: {name} ({code})")
@@ -46,9 +45,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
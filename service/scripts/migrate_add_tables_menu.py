@@ -2,17 +2,12 @@
 """
 添加独立的多维表格菜单权限（不在配置中心下）
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 独立的多维表格菜单权限
@@ -22,16 +17,9 @@ TABLES_MENU_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """将多维表格菜单改为独立菜单（不在配置中心下）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
         # 1. 检查是否存在 menu:config:tables（配置中心下的）
         existing_config_tables = await conn.fetchval("""
@@ -56,17 +44,16 @@ async def migrate():
         else:
             # 如果不存在，创建新的独立菜单
             for code, name, resource, action, description, parent_code, sort_order in TABLES_MENU_PERMISSIONS:
-                pid = str(uuid.uuid4())
                 await conn.execute("""
                     INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, 'menu', $6, NULL, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                    VALUES (gen_random_uuid()::text, $1, $2, $3, $4, 'menu', $5, NULL, $6, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                     ON CONFLICT (code) DO UPDATE
                     SET name = EXCLUDED.name,
                         description = EXCLUDED.description,
                         sort_order = EXCLUDED.sort_order,
                         parent_id = NULL,
                         updated_at = CURRENT_TIMESTAMP
-                """, pid, name, code, resource, action, description or "", sort_order)
+                """, name, code, resource, action, description or "", sort_order)
                 print(f"✅ 创建/更新菜单: {name} ({code})")
         
         print(f"✅ 多维表格菜单权限迁移完成")
@@ -74,9 +61,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -3,10 +3,12 @@
 添加多维表格的菜单按钮权限（type=menu）
 对应前端 app/lib/permissions.ts 中的 MENU_BUTTON_PERMISSIONS.tables
 """
-import asyncio
-import uuid
 import asyncpg
-from app.core.config import settings
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 多维表格菜单按钮权限种子：(code, name, resource, action, description)
@@ -18,26 +20,23 @@ MENU_BUTTON_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """插入多维表格菜单按钮权限（type=menu，code 已存在则跳过）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
-        inserted = 0
-        for code, name, resource, action, description in MENU_BUTTON_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            result = await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'menu', $6, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-            """, pid, name, code, resource, action, description or "")
-            if result == "INSERT 0 1":
-                inserted += 1
+        # 各列以并行数组传入，服务端 unnest 展开为多行一次写入；RETURNING code 只返回实际新增的行
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*MENU_BUTTON_PERMISSIONS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'menu', COALESCE(t.description, ''), 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[]) AS t(code, name, resource, action, description)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions)
+        inserted_codes = {r["code"] for r in returned}
+        inserted = len(inserted_codes)
+        for code, name, *_ in MENU_BUTTON_PERMISSIONS:
+            if code in inserted_codes:
                 print(f"✅ 创建权限: {name} ({code})")
             else:
                 print(f"⏭️  权限已存在，跳过: {name} ({code})")
@@ -48,12 +47,11 @@ async def migrate():
         """)
         
         if menu_list_permission_id:
-            for code, name, resource, action, description in MENU_BUTTON_PERMISSIONS:
-                await conn.execute("""
-                    UPDATE permissions 
-                    SET parent_id = $1 
-                    WHERE code = $2 AND parent_id IS NULL
-                """, menu_list_permission_id, code)
+            await conn.execute("""
+                UPDATE permissions 
+                SET parent_id = $1 
+                WHERE code = ANY($2::text[]) AND parent_id IS NULL
+            """, menu_list_permission_id, codes)
             print(f"✅ 已将多维表格按钮权限关联到父菜单 menu:tables:list")
         else:
             print(f"⚠️  未找到父菜单 menu:tables:list，跳过设置 parent_id")
@@ -62,9 +60,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
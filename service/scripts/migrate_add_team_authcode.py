@@ -4,22 +4,22 @@
 数据库迁移脚本：为团队表添加 authcode 字段，并为现有团队生成 authcode
 """
 import asyncio
-import sys
-import os
 import secrets
-import string
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from sqlalchemy import text
 from app.core.database import engine
 
+# 每轮回填的团队数
+BATCH_SIZE = 1000
+
 
 def generate_authcode() -> str:
     """生成 API 认证码（32位随机字符串）"""
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(32))
+    # 24 字节随机数经 URL 安全的 base64 编码恰为 32 个字符，一次读取随机源，无需逐字符选取
+    return secrets.token_urlsafe(24)
 
 
 async def migrate():
@@ -27,79 +27,82 @@ async def migrate():
     async with engine.begin() as conn:
         print("开始迁移：为团队表添加 authcode 字段...")
         
-        # 1. 检查 authcode 列是否已存在
-        check_column_query = text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'teams' AND column_name = 'authcode'
-        """)
-        result = await conn.execute(check_column_query)
-        column_exists = result.scalar_one_or_none() is not None
+        # 一次查询系统目录得到列与两个索引的现状；已存在的对象不再下发 DDL。
+        # 即便带 IF NOT EXISTS，ALTER TABLE 仍会先取 teams 的 ACCESS EXCLUSIVE 锁、CREATE INDEX 仍会取 SHARE 锁，
+        # 重复执行迁移时跳过它们可避免阻塞线上读写
+        result = await conn.execute(text("""
+            SELECT
+                EXISTS (
+                    SELECT 1 FROM pg_attribute
+                    WHERE attrelid = 'teams'::regclass
+                      AND attname = 'authcode' AND attnum > 0 AND NOT attisdropped
+                ) AS has_column,
+                to_regclass('idx_teams_authcode') IS NOT NULL AS has_unique_index,
+                to_regclass('idx_teams_authcode_query') IS NOT NULL AS has_query_index
+        """))
+        has_column, has_unique_index, has_query_index = result.one()
         
-        if not column_exists:
-            print("添加 authcode 列...")
-            # 添加 authcode 列（允许为空，稍后填充）
+        # 1. 添加 authcode 列（允许为空，稍后填充）
+        if has_column:
+            print("✓ authcode 列已存在，跳过")
+        else:
             await conn.execute(text("""
                 ALTER TABLE teams 
-                ADD COLUMN authcode VARCHAR NULL
+                ADD COLUMN IF NOT EXISTS authcode VARCHAR NULL
             """))
             print("✓ authcode 列已添加")
-        else:
-            print("✓ authcode 列已存在，跳过添加")
         
-        # 2. 为现有团队生成 authcode
-        print("为现有团队生成 authcode...")
-        
-        # 获取所有没有 authcode 的团队
-        get_teams_query = text("SELECT id FROM teams WHERE authcode IS NULL")
-        result = await conn.execute(get_teams_query)
-        teams_without_authcode = result.fetchall()
-        
-        if teams_without_authcode:
-            print(f"找到 {len(teams_without_authcode)} 个需要生成 authcode 的团队")
-            
-            for (team_id,) in teams_without_authcode:
-                # 生成唯一的 authcode
-                authcode = generate_authcode()
-                
-                # 检查是否已存在（极小概率）
-                check_unique_query = text("SELECT id FROM teams WHERE authcode = :authcode")
-                existing = await conn.execute(check_unique_query, {"authcode": authcode})
-                while existing.scalar_one_or_none():
-                    authcode = generate_authcode()
-                    existing = await conn.execute(check_unique_query, {"authcode": authcode})
-                
-                # 更新团队的 authcode
-                update_query = text("UPDATE teams SET authcode = :authcode WHERE id = :team_id")
-                await conn.execute(update_query, {"authcode": authcode, "team_id": team_id})
-                print(f"  ✓ 团队 {team_id} 的 authcode 已生成")
-            
-            print(f"✓ 已为 {len(teams_without_authcode)} 个团队生成 authcode")
+        # 2. 先建唯一索引，由数据库保证 authcode 唯一，填充时无需逐个查重
+        if has_unique_index:
+            print("✓ authcode 唯一索引已存在，跳过")
         else:
-            print("✓ 所有团队都已拥有 authcode")
-        
-        # 3. 添加唯一索引
-        print("添加 authcode 唯一索引...")
-        try:
+            print("添加 authcode 唯一索引...")
             await conn.execute(text("""
                 CREATE UNIQUE INDEX IF NOT EXISTS idx_teams_authcode 
                 ON teams(authcode) 
                 WHERE authcode IS NOT NULL
             """))
             print("✓ authcode 唯一索引已添加")
-        except Exception as e:
-            print(f"  ⚠ 索引可能已存在: {e}")
+        
+        # 3. 为现有团队分批生成 authcode：每轮最多取 BATCH_SIZE 个缺失的团队，unnest 一条 UPDATE 写入，
+        #    内存占用与团队总数无关；与已有 authcode 重复的（极小概率）不写入，后续轮次重新生成
+        print("为现有团队生成 authcode...")
+        total = 0
+        while True:
+            result = await conn.execute(
+                text("SELECT id FROM teams WHERE authcode IS NULL LIMIT :limit"),
+                {"limit": BATCH_SIZE},
+            )
+            team_ids = [row[0] for row in result.fetchall()]
+            if not team_ids:
+                break
+            result = await conn.execute(
+                text("""
+                    UPDATE teams AS t
+                    SET authcode = v.authcode
+                    FROM unnest(CAST(:team_ids AS text[]), CAST(:authcodes AS text[])) AS v(team_id, authcode)
+                    WHERE t.id = v.team_id
+                      AND NOT EXISTS (SELECT 1 FROM teams t2 WHERE t2.authcode = v.authcode)
+                """),
+                {"team_ids": team_ids, "authcodes": [generate_authcode() for _ in team_ids]},
+            )
+            total += result.rowcount
+        
+        if total:
+            print(f"✓ 已为 {total} 个团队生成 authcode")
+        else:
+            print("✓ 所有团队都已拥有 authcode")
         
         # 4. 添加普通索引（用于查询）
-        print("添加 authcode 查询索引...")
-        try:
+        if has_query_index:
+            print("✓ authcode 查询索引已存在，跳过")
+        else:
+            print("添加 authcode 查询索引...")
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_teams_authcode_query 
                 ON teams(authcode)
             """))
             print("✓ authcode 查询索引已添加")
-        except Exception as e:
-            print(f"  ⚠ 索引可能已存在: {e}")
         
         print("\n迁移完成！")
 
@@ -2,17 +2,12 @@
 """
 添加团队管理菜单权限（仅系统管理员可见）
 """
-import asyncio
-import sys
-from pathlib import Path
-import uuid
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 团队管理菜单权限
@@ -22,43 +17,39 @@ TEAM_MENU_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """添加团队管理菜单权限"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
-        inserted = 0
-        for code, name, resource, action, description, parent_code, sort_order in TEAM_MENU_PERMISSIONS:
-            # 检查是否已存在
-            existing = await conn.fetchval("""
-                SELECT id FROM permissions WHERE code = $1
-            """, code)
-            
-            if existing:
-                print(f"⏭️  菜单权限已存在，跳过: {name} ({code})")
-            else:
-                pid = str(uuid.uuid4())
-                await conn.execute("""
-                    INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, 'menu', $6, NULL, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                """, pid, name, code, resource, action, description or "", sort_order)
-                inserted += 1
+        # 存在判断交给 ON CONFLICT，各列以并行数组传入，服务端 unnest 一次写入；RETURNING code 只返回实际新增的行
+        codes = [p[0] for p in TEAM_MENU_PERMISSIONS]
+        names = [p[1] for p in TEAM_MENU_PERMISSIONS]
+        resources = [p[2] for p in TEAM_MENU_PERMISSIONS]
+        actions = [p[3] for p in TEAM_MENU_PERMISSIONS]
+        descriptions = [p[4] or "" for p in TEAM_MENU_PERMISSIONS]
+        sort_orders = [p[6] for p in TEAM_MENU_PERMISSIONS]
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'menu', t.description, NULL, t.sort_order, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::int[])
+                AS t(code, name, resource, action, description, sort_order)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions, sort_orders)
+        inserted_codes = {r["code"] for r in returned}
+        inserted = len(inserted_codes)
+        for code, name, *_ in TEAM_MENU_PERMISSIONS:
+            if code in inserted_codes:
                 print(f"✅ 创建菜单权限: {name} ({code})")
+            else:
+                print(f"⏭️  菜单权限已存在，跳过: {name} ({code})")
         
         print(f"✅ 团队管理菜单权限迁移完成（共 {len(TEAM_MENU_PERMISSIONS)} 条，新增 {inserted} 条）")
 
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,25 +2,16 @@
 """
 创建 user_dashboard_config 表，用于存储用户工作台布局配置
 """
-import asyncio
-import sys
-from pathlib import Path
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
-from app.core.config import settings
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS user_dashboard_config (
@@ -32,16 +23,17 @@ async def migrate():
                 UNIQUE(user_id)
             );
         """)
-        await conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_user_dashboard_config_user_id ON user_dashboard_config(user_id);"
+        # CONCURRENTLY 不阻塞写入；须单独执行，不能放在事务块中
+        await create_index_concurrently(
+            conn,
+            "idx_user_dashboard_config_user_id",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_dashboard_config_user_id ON user_dashboard_config(user_id);",
         )
         print("✅ user_dashboard_config 表创建成功")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -3,70 +3,71 @@
 为常用查询添加复合索引的数据库迁移脚本
 
 - customer_history: (tenant_id, deleted)、(member_user_id, deleted) 便于按租户/用户筛未删除列表
-- prompts: (tenant_id, scene) 便于按租户+场景查提示词；(scene, is_default, team_code) 便于查默认提示词
+- prompts: (tenant_id, scene) 便于按租户+场景查提示词；(scene, team_code) WHERE is_default 便于查默认提示词
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
-    """创建复合索引"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
 
-    try:
-        # customer_history：按租户/用户筛未删除列表
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_tenant_deleted
-            ON customer_history(tenant_id, deleted);
-        """)
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_member_deleted
-            ON customer_history(member_user_id, deleted);
-        """)
 
-        # prompts：按租户+场景查提示词（/api/prompts/{scene}?tenant_id=xxx）
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_prompts_tenant_scene
-            ON prompts(tenant_id, scene);
-        """)
-        # prompts：按场景+是否默认+团队查默认提示词
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_prompts_scene_default_team
-            ON prompts(scene, is_default, team_code);
-        """)
+# 索引：(索引名, 语句)。以 CONCURRENTLY 在线建索引，不阻塞大表写入；
+# asyncpg 连接默认自动提交，每条语句单独执行，不在事务块中
+COMPOSITE_INDEXES = [
+    # customer_history：按租户/用户筛未删除列表
+    ("idx_customer_history_tenant_deleted", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customer_history_tenant_deleted
+        ON customer_history(tenant_id, deleted);
+    """),
+    ("idx_customer_history_member_deleted", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customer_history_member_deleted
+        ON customer_history(member_user_id, deleted);
+    """),
+    # prompts：按租户+场景查提示词（/api/prompts/{scene}?tenant_id=xxx）
+    ("idx_prompts_tenant_scene", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prompts_tenant_scene
+        ON prompts(tenant_id, scene);
+    """),
+    # prompts：按场景+团队查默认提示词；is_default 为低选择性布尔列，放入部分索引谓词而非索引键，
+    # 索引只包含默认提示词行，体积更小；替换旧的 (scene, is_default, team_code) 索引
+    ("idx_prompts_default_scene_team", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prompts_default_scene_team
+        ON prompts(scene, team_code) WHERE is_default = true;
+    """),
+    # 多维表格行：优化按表格和团队查询行的性能
+    ("idx_multi_dimension_table_rows_table_team", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_table_rows_table_team
+        ON multi_dimension_table_rows(table_id, team_id);
+    """),
+    # 多维表格单元格：优化批量查询单元格的性能（按表格和行ID）
+    ("idx_multi_dimension_table_cells_table_row", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_table_cells_table_row
+        ON multi_dimension_table_cells(table_id, row_id);
+    """),
+    # 多维表格单元格：优化按行ID批量查询（用于行列表查询）
+    ("idx_multi_dimension_table_cells_row_id", """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_table_cells_row_id
+        ON multi_dimension_table_cells(row_id);
+    """),
+]
+
 
-        # 多维表格行：优化按表格和团队查询行的性能
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_multi_dimension_table_rows_table_team
-            ON multi_dimension_table_rows(table_id, team_id);
-        """)
-        
-        # 多维表格单元格：优化批量查询单元格的性能（按表格和行ID）
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_multi_dimension_table_cells_table_row
-            ON multi_dimension_table_cells(table_id, row_id);
-        """)
-        
-        # 多维表格单元格：优化按行ID批量查询（用于行列表查询）
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_multi_dimension_table_cells_row_id
-            ON multi_dimension_table_cells(row_id);
-        """)
+@migration
+async def migrate(conn: asyncpg.Connection):
+    """创建复合索引"""
+    try:
+        for index_name, sql in COMPOSITE_INDEXES:
+            await create_index_concurrently(conn, index_name, sql)
+        # 新的部分索引已建好，删除被其替换的旧索引
+        await conn.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_prompts_scene_default_team;")
 
         print("✅ 复合索引创建成功")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,28 +2,18 @@
 """
 将组合调试菜单名称改为「组合」
 """
-import asyncio
-import sys
-from pathlib import Path
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """将 menu:compositions:list 的 name 从「组合调试」改为「组合」"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
         result = await conn.execute(
             """
@@ -45,10 +35,20 @@ async def migrate():
                 db=settings.REDIS_DB,
                 decode_responses=True,
             )
-            keys = await redis_client.keys("menu_tree:v1:*")
-            if keys:
-                await redis_client.delete(*keys)
-                print(f"✅ 已清除 {len(keys)} 个菜单树缓存")
+            # SCAN 增量遍历（KEYS 会阻塞整个实例），按批 UNLINK（后台释放内存）
+            removed = 0
+            to_del = []
+            async for key in redis_client.scan_iter(match="menu_tree:v1:*", count=500):
+                to_del.append(key)
+                if len(to_del) >= 500:
+                    await redis_client.unlink(*to_del)
+                    removed += len(to_del)
+                    to_del.clear()
+            if to_del:
+                await redis_client.unlink(*to_del)
+                removed += len(to_del)
+            if removed:
+                print(f"✅ 已清除 {removed} 个菜单树缓存")
             await redis_client.aclose()
         except Exception as e:
             print(f"⚠️  清除缓存失败（可忽略，请刷新页面或重新登录）: {e}")
@@ -56,9 +56,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -2,21 +2,40 @@
 """
 创建客户历史数据表的数据库迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
+from scripts._migrate_runtime import migration, run_migration
+
+
+# 索引与表/列注释（PostgreSQL 使用 COMMENT ON 语法）
+CUSTOMER_HISTORY_INDEXES_AND_COMMENTS = """
+    CREATE INDEX IF NOT EXISTS idx_customer_history_member_user_id ON customer_history(member_user_id);
+    CREATE INDEX IF NOT EXISTS idx_customer_history_conversation_id ON customer_history(conversation_id);
+    CREATE INDEX IF NOT EXISTS idx_customer_history_tenant_id ON customer_history(tenant_id);
+    CREATE INDEX IF NOT EXISTS idx_customer_history_company_name ON customer_history(company_name);
+    CREATE INDEX IF NOT EXISTS idx_customer_history_deleted ON customer_history(deleted);
+
+    COMMENT ON TABLE customer_history IS 'DMU+FABE+SPI合并表';
+    COMMENT ON COLUMN customer_history.decision_units IS 'DMU 信息（JSON 格式）';
+    COMMENT ON COLUMN customer_history.fabe_spi IS 'FABE 信息（JSON 格式）';
+    COMMENT ON COLUMN customer_history.opportunity_score IS '机会评分（JSON 格式，包括 calculation、score、tendency）';
+    COMMENT ON COLUMN customer_history.member_user_id IS '用户编号';
+    COMMENT ON COLUMN customer_history.conversation_id IS '对话编号';
+    COMMENT ON COLUMN customer_history.creator IS '创建人';
+    COMMENT ON COLUMN customer_history.create_time IS '创建时间';
+    COMMENT ON COLUMN customer_history.updater IS '更新人';
+    COMMENT ON COLUMN customer_history.update_time IS '更新时间';
+    COMMENT ON COLUMN customer_history.deleted IS '是否删除 0：未删除，1：已删除';
+    COMMENT ON COLUMN customer_history.tenant_id IS '租户编号';
+"""
+
+
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """创建客户历史数据表"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         # 项目未上线、数据为测试数据，允许先删表再重建
         await conn.execute("DROP TABLE IF EXISTS customer_history CASCADE;")
@@ -40,90 +59,16 @@ async def migrate():
             );
         """)
         
-        # 创建索引
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_member_user_id 
-            ON customer_history(member_user_id);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_conversation_id 
-            ON customer_history(conversation_id);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_tenant_id 
-            ON customer_history(tenant_id);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_company_name 
-            ON customer_history(company_name);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_customer_history_deleted 
-            ON customer_history(deleted);
-        """)
-        
-        # 添加表注释（PostgreSQL使用COMMENT ON语法）
-        await conn.execute("""
-            COMMENT ON TABLE customer_history IS 'DMU+FABE+SPI合并表';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.decision_units IS 'DMU 信息（JSON 格式）';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.fabe_spi IS 'FABE 信息（JSON 格式）';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.opportunity_score IS '机会评分（JSON 格式，包括 calculation、score、tendency）';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.member_user_id IS '用户编号';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.conversation_id IS '对话编号';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.creator IS '创建人';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.create_time IS '创建时间';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.updater IS '更新人';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.update_time IS '更新时间';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.deleted IS '是否删除 0：未删除，1：已删除';
-        """)
-        
-        await conn.execute("""
-            COMMENT ON COLUMN customer_history.tenant_id IS '租户编号';
-        """)
+        # 索引与注释均为无参数语句，合并为一个脚本走简单查询协议，一次往返完成
+        await conn.execute(CUSTOMER_HISTORY_INDEXES_AND_COMMENTS)
         
         print("✅ 客户历史数据表创建成功")
         
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
 
@@ -2,21 +2,28 @@
 """
 创建DMU报告表的数据库迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+# 索引：(索引名, 语句)。表可能已有数据，CONCURRENTLY 不阻塞写入；须逐条执行，不能放在事务块中
+DMU_REPORT_INDEXES = [
+    ("idx_dmu_reports_conversation_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_dmu_reports_conversation_id ON dmu_reports(conversation_id)"),
+    ("idx_dmu_reports_company_name",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_dmu_reports_company_name ON dmu_reports(company_name)"),
+    ("idx_dmu_reports_tenant_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_dmu_reports_tenant_id ON dmu_reports(tenant_id)"),
+]
+
+
+@migration
+async def migrate(conn: asyncpg.Connection):
     """创建DMU报告表"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         # 创建dmu_reports表
         await conn.execute("""
@@ -33,30 +40,16 @@ async def migrate():
         """)
         
         # 创建索引
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_dmu_reports_conversation_id 
-            ON dmu_reports(conversation_id);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_dmu_reports_company_name 
-            ON dmu_reports(company_name);
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_dmu_reports_tenant_id 
-            ON dmu_reports(tenant_id);
-        """)
+        for index_name, sql in DMU_REPORT_INDEXES:
+            await create_index_concurrently(conn, index_name, sql)
         
         print("✅ DMU报告表创建成功")
         
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
 
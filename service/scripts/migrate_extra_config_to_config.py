@@ -2,26 +2,16 @@
 """
 迁移 extra_config 数据到 config 列，然后删除 extra_config 列
 """
-import asyncio
-import sys
-from pathlib import Path
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         # 检查是否有数据在 extra_config 中
         rows_with_extra_config = await conn.fetch("""
@@ -58,9 +48,10 @@ async def migrate():
             print('✅ 迁移完成，现在只有 config 列')
         else:
             print(f'⚠️  列状态: {remaining}')
-    finally:
-        await conn.close()
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        raise
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -4,183 +4,212 @@
 并为 tenants/rags 的 created_by/updated_by 增加 users.id 外键约束。
 保留 scene、team_code 等字段以兼容现有逻辑；新字段可逐步用于 JOIN 与一致性校验。
 """
-import asyncio
-import sys
-from pathlib import Path
-
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
-from app.core.config import settings
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+# scene_id / team_id 索引：(表, 列, 索引名)。以 CONCURRENTLY 在线创建，不阻塞各表写入；须在事务外逐条执行。
+# 由 ORM create_all 建表的库已有 ix_<表>_<列> 索引，列上已有以其为首列的 B-tree 索引时跳过，避免重复索引带来的写放大
+FK_SCENE_TEAM_INDEXES = [
+    ("prompts", "scene_id", "idx_prompts_scene_id"),
+    ("placeholders", "scene_id", "idx_placeholders_scene_id"),
+    ("users", "team_id", "idx_users_team_id"),
+    ("tenants", "team_id", "idx_tenants_team_id"),
+    ("roles", "team_id", "idx_roles_team_id"),
+    ("scenes", "team_id", "idx_scenes_team_id"),
+    ("prompts", "team_id", "idx_prompts_team_id"),
+    ("rags", "team_id", "idx_rags_team_id"),
+]
+
+
+# 每张表的元数据 DDL：加列 + 外键以 NOT VALID 添加（仅改元数据，不扫描存量行）。
+# 每张表一个无参数多语句脚本，单独提交：ACCESS EXCLUSIVE 锁只在该表的几条 DDL 期间持有，不跨表、不等回填
+FK_SCENE_TEAM_DDL = [
+    ("prompts", """
+        ALTER TABLE prompts ADD COLUMN IF NOT EXISTS scene_id VARCHAR(36);
+        ALTER TABLE prompts ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE prompts DROP CONSTRAINT IF EXISTS fk_prompts_scene;
+        ALTER TABLE prompts ADD CONSTRAINT fk_prompts_scene
+            FOREIGN KEY (scene_id) REFERENCES scenes(id) ON DELETE SET NULL NOT VALID;
+        ALTER TABLE prompts DROP CONSTRAINT IF EXISTS fk_prompts_team;
+        ALTER TABLE prompts ADD CONSTRAINT fk_prompts_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("placeholders", """
+        ALTER TABLE placeholders ADD COLUMN IF NOT EXISTS scene_id VARCHAR(36);
+        ALTER TABLE placeholders DROP CONSTRAINT IF EXISTS fk_placeholders_scene;
+        ALTER TABLE placeholders ADD CONSTRAINT fk_placeholders_scene
+            FOREIGN KEY (scene_id) REFERENCES scenes(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("users", """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE users DROP CONSTRAINT IF EXISTS fk_users_team;
+        ALTER TABLE users ADD CONSTRAINT fk_users_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("tenants", """
+        ALTER TABLE tenants ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_team;
+        ALTER TABLE tenants ADD CONSTRAINT fk_tenants_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+        ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_created_by;
+        ALTER TABLE tenants ADD CONSTRAINT fk_tenants_created_by
+            FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL NOT VALID;
+        ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_updated_by;
+        ALTER TABLE tenants ADD CONSTRAINT fk_tenants_updated_by
+            FOREIGN KEY (updated_by) REFERENCES users(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("roles", """
+        ALTER TABLE roles ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE roles DROP CONSTRAINT IF EXISTS fk_roles_team;
+        ALTER TABLE roles ADD CONSTRAINT fk_roles_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("scenes", """
+        ALTER TABLE scenes ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE scenes DROP CONSTRAINT IF EXISTS fk_scenes_team;
+        ALTER TABLE scenes ADD CONSTRAINT fk_scenes_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+    """),
+    ("rags", """
+        ALTER TABLE rags ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
+        ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_team;
+        ALTER TABLE rags ADD CONSTRAINT fk_rags_team
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL NOT VALID;
+        ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_created_by;
+        ALTER TABLE rags ADD CONSTRAINT fk_rags_created_by
+            FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL NOT VALID;
+        ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_updated_by;
+        ALTER TABLE rags ADD CONSTRAINT fk_rags_updated_by
+            FOREIGN KEY (updated_by) REFERENCES users(id) ON DELETE SET NULL NOT VALID;
+    """),
+]
+
+# 按编码回填外键列：(表, 外键列, 被引用表, 本表编码列)。被引用表的 code 可能不唯一（如同名场景），取最小 id 保证结果确定、重跑收敛
+FK_SCENE_TEAM_BACKFILLS = [
+    ("prompts", "scene_id", "scenes", "scene"),
+    ("placeholders", "scene_id", "scenes", "scene"),
+    ("users", "team_id", "teams", "team_code"),
+    ("tenants", "team_id", "teams", "team_code"),
+    ("roles", "team_id", "teams", "team_code"),
+    ("scenes", "team_id", "teams", "team_code"),
+    ("prompts", "team_id", "teams", "team_code"),
+    ("rags", "team_id", "teams", "team_code"),
+]
+
+# created_by/updated_by 指向不存在用户的行置空，VALIDATE 前清理；
+# 两列在同一条 UPDATE 中处理：两列都失效的行也只改写一次（一个新行版本），
+# 每行按 users 主键探测；不用 NOT IN（子查询含 NULL 时结果恒为空，语义易错）
+AUDIT_COLUMN_TABLES = ["tenants", "rags"]
 
+# 外键 VALIDATE 在全部回填完成后逐条执行：只取 SHARE UPDATE EXCLUSIVE 锁，校验期间表仍可读写
+FK_SCENE_TEAM_CONSTRAINTS = [
+    ("prompts", "fk_prompts_scene"),
+    ("placeholders", "fk_placeholders_scene"),
+    ("users", "fk_users_team"),
+    ("tenants", "fk_tenants_team"),
+    ("tenants", "fk_tenants_created_by"),
+    ("tenants", "fk_tenants_updated_by"),
+    ("roles", "fk_roles_team"),
+    ("scenes", "fk_scenes_team"),
+    ("prompts", "fk_prompts_team"),
+    ("rags", "fk_rags_team"),
+    ("rags", "fk_rags_created_by"),
+    ("rags", "fk_rags_updated_by"),
+]
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+# 回填每批行数：每批为一条自动提交的 UPDATE，行锁只持有一批的时长
+BACKFILL_BATCH_SIZE = 1000
+
+
+async def _backfill_in_batches(conn: asyncpg.Connection, table: str, update_sql: str) -> int:
+    """
+    按主键分批执行回填 UPDATE，返回更新行数
+
+    update_sql 为以 batch（本批主键）为范围的 UPDATE 语句（目标表别名 t）；
+    每批按 id 键集翻页取下一段主键，单独一条语句自动提交，不长时间持有行锁
+    """
+    sql = f"""
+        WITH batch AS (
+            SELECT id FROM {table} WHERE $1 IS NULL OR id > $1 ORDER BY id LIMIT $2
+        ), upd AS (
+            {update_sql}
+            RETURNING 1
+        )
+        SELECT (SELECT max(id) FROM batch) AS last_id, (SELECT count(*) FROM upd) AS updated
+    """
+    last_id, total = None, 0
+    while True:
+        row = await conn.fetchrow(sql, last_id, BACKFILL_BATCH_SIZE)
+        if row["last_id"] is None:
+            return total
+        last_id = row["last_id"]
+        total += row["updated"]
+
+
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
-        # 1. prompts: scene_id
-        await conn.execute("""
-            ALTER TABLE prompts ADD COLUMN IF NOT EXISTS scene_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE prompts p SET scene_id = s.id FROM scenes s WHERE s.code = p.scene;
-        """)
-        await conn.execute("""
-            ALTER TABLE prompts DROP CONSTRAINT IF EXISTS fk_prompts_scene;
-            ALTER TABLE prompts ADD CONSTRAINT fk_prompts_scene
-                FOREIGN KEY (scene_id) REFERENCES scenes(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_prompts_scene_id ON prompts(scene_id);")
-
-        # 2. placeholders: scene_id
-        await conn.execute("""
-            ALTER TABLE placeholders ADD COLUMN IF NOT EXISTS scene_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE placeholders p SET scene_id = s.id FROM scenes s WHERE s.code = p.scene;
-        """)
-        await conn.execute("""
-            ALTER TABLE placeholders DROP CONSTRAINT IF EXISTS fk_placeholders_scene;
-            ALTER TABLE placeholders ADD CONSTRAINT fk_placeholders_scene
-                FOREIGN KEY (scene_id) REFERENCES scenes(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_placeholders_scene_id ON placeholders(scene_id);")
-
-        # 3. users: team_id
-        await conn.execute("""
-            ALTER TABLE users ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE users u SET team_id = t.id FROM teams t WHERE t.code = u.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE users DROP CONSTRAINT IF EXISTS fk_users_team;
-            ALTER TABLE users ADD CONSTRAINT fk_users_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_users_team_id ON users(team_id);")
-
-        # 4. tenants: team_id + created_by/updated_by FK
-        await conn.execute("""
-            ALTER TABLE tenants ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE tenants tn SET team_id = t.id FROM teams t WHERE t.code = tn.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_team;
-            ALTER TABLE tenants ADD CONSTRAINT fk_tenants_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenants_team_id ON tenants(team_id);")
-        # 将不存在于 users 的 created_by/updated_by 置空后再加外键
-        await conn.execute("""
-            UPDATE tenants SET created_by = NULL WHERE created_by IS NOT NULL
-            AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = tenants.created_by);
-        """)
-        await conn.execute("""
-            UPDATE tenants SET updated_by = NULL WHERE updated_by IS NOT NULL
-            AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = tenants.updated_by);
-        """)
-        await conn.execute("""
-            ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_created_by;
-            ALTER TABLE tenants ADD CONSTRAINT fk_tenants_created_by
-                FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("""
-            ALTER TABLE tenants DROP CONSTRAINT IF EXISTS fk_tenants_updated_by;
-            ALTER TABLE tenants ADD CONSTRAINT fk_tenants_updated_by
-                FOREIGN KEY (updated_by) REFERENCES users(id) ON DELETE SET NULL;
-        """)
-
-        # 5. roles: team_id
-        await conn.execute("""
-            ALTER TABLE roles ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE roles r SET team_id = t.id FROM teams t WHERE t.code = r.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE roles DROP CONSTRAINT IF EXISTS fk_roles_team;
-            ALTER TABLE roles ADD CONSTRAINT fk_roles_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_roles_team_id ON roles(team_id);")
-
-        # 6. scenes: team_id
-        await conn.execute("""
-            ALTER TABLE scenes ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE scenes s SET team_id = t.id FROM teams t WHERE t.code = s.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE scenes DROP CONSTRAINT IF EXISTS fk_scenes_team;
-            ALTER TABLE scenes ADD CONSTRAINT fk_scenes_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_scenes_team_id ON scenes(team_id);")
-
-        # 7. prompts: team_id (already have scene_id)
-        await conn.execute("""
-            ALTER TABLE prompts ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE prompts p SET team_id = t.id FROM teams t WHERE t.code = p.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE prompts DROP CONSTRAINT IF EXISTS fk_prompts_team;
-            ALTER TABLE prompts ADD CONSTRAINT fk_prompts_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_prompts_team_id ON prompts(team_id);")
-
-        # 8. rags: team_id + created_by/updated_by FK
-        await conn.execute("""
-            ALTER TABLE rags ADD COLUMN IF NOT EXISTS team_id VARCHAR(36);
-        """)
-        await conn.execute("""
-            UPDATE rags r SET team_id = t.id FROM teams t WHERE t.code = r.team_code;
-        """)
-        await conn.execute("""
-            ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_team;
-            ALTER TABLE rags ADD CONSTRAINT fk_rags_team
-                FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_rags_team_id ON rags(team_id);")
-        await conn.execute("""
-            UPDATE rags SET created_by = NULL WHERE created_by IS NOT NULL
-            AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = rags.created_by);
-        """)
-        await conn.execute("""
-            UPDATE rags SET updated_by = NULL WHERE updated_by IS NOT NULL
-            AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = rags.updated_by);
-        """)
-        await conn.execute("""
-            ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_created_by;
-            ALTER TABLE rags ADD CONSTRAINT fk_rags_created_by
-                FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
-        """)
-        await conn.execute("""
-            ALTER TABLE rags DROP CONSTRAINT IF EXISTS fk_rags_updated_by;
-            ALTER TABLE rags ADD CONSTRAINT fk_rags_updated_by
-                FOREIGN KEY (updated_by) REFERENCES users(id) ON DELETE SET NULL;
-        """)
+        # 1. 每张表的加列与 NOT VALID 外键各自单独提交，表锁只持有毫秒级
+        for table, ddl in FK_SCENE_TEAM_DDL:
+            await conn.execute(ddl)
+            print(f"✅ {table} 字段与外键（NOT VALID）已就绪")
+
+        # 2. 分批回填：NOT VALID 外键已对新写入生效，回填值均取自被引用表，满足约束
+        for table, column, ref_table, code_column in FK_SCENE_TEAM_BACKFILLS:
+            updated = await _backfill_in_batches(conn, table, f"""
+                UPDATE {table} t SET {column} = m.ref_id
+                FROM (
+                    SELECT x.id, (SELECT min(r.id) FROM {ref_table} r WHERE r.code = x.{code_column}) AS ref_id
+                    FROM {table} x JOIN batch USING (id)
+                ) m
+                WHERE t.id = m.id AND m.ref_id IS NOT NULL AND t.{column} IS DISTINCT FROM m.ref_id
+            """)
+            print(f"✅ {table}.{column} 回填 {updated} 行")
+        for table in AUDIT_COLUMN_TABLES:
+            updated = await _backfill_in_batches(conn, table, f"""
+                UPDATE {table} t SET
+                    created_by = CASE WHEN EXISTS (SELECT 1 FROM users u WHERE u.id = t.created_by) THEN t.created_by END,
+                    updated_by = CASE WHEN EXISTS (SELECT 1 FROM users u WHERE u.id = t.updated_by) THEN t.updated_by END
+                FROM batch b
+                WHERE t.id = b.id
+                  AND ((t.created_by IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.created_by))
+                    OR (t.updated_by IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.updated_by)))
+            """)
+            if updated:
+                print(f"⚠️  {table} 有 {updated} 行 created_by/updated_by 指向不存在的用户，已置空")
+
+        # 3. 全部回填完成后再校验外键（不在 DDL 事务中）
+        for table, constraint in FK_SCENE_TEAM_CONSTRAINTS:
+            await conn.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+        indexed = {
+            (r["table_name"], r["column_name"])
+            for r in await conn.fetch("""
+                SELECT t.relname AS table_name, a.attname AS column_name
+                FROM pg_index i
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_class ic ON ic.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = ic.relam AND am.amname = 'btree'
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = ANY($1::regclass[]) AND i.indpred IS NULL AND i.indisvalid
+            """, sorted({table for table, _, _ in FK_SCENE_TEAM_INDEXES}))
+        }
+        for table, column, index_name in FK_SCENE_TEAM_INDEXES:
+            if (table, column) in indexed:
+                print(f"⏭️  {table}.{column} 已有索引，跳过 {index_name}")
+                continue
+            await create_index_concurrently(
+                conn, index_name, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table}({column})"
+            )
 
         print("✅ scene_id / team_id / created_by·updated_by 外键迁移成功")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
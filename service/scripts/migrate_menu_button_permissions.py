@@ -3,10 +3,12 @@
 为菜单权限补充「按钮」级权限：各资源下的创建/编辑/删除等，由菜单权限控制显隐（与后端接口校验无关）。
 执行后，角色分配「菜单权限」时可见：租户管理（列表+新建+编辑+删除）、提示词/权限管理同理。
 """
-import asyncio
-import uuid
 import asyncpg
-from app.core.config import settings
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 菜单按钮权限种子：code -> (name, resource, action, description)
@@ -32,32 +34,24 @@ MENU_BUTTON_PERMISSIONS = [
 ]
 
 
-async def migrate():
+@migration
+async def migrate(conn: asyncpg.Connection):
     """插入菜单按钮权限（type=menu，code 已存在则跳过）"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
     try:
-        n = 0
-        for code, name, resource, action, description in MENU_BUTTON_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'menu', $6, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-            """, pid, name, code, resource, action, description or "")
-            n += 1
-        print(f"✅ 菜单按钮权限种子已写入（共 {len(MENU_BUTTON_PERMISSIONS)} 条，若 code 已存在则跳过）")
+        # 各列以并行数组传入，服务端 unnest 展开为多行一次写入；RETURNING code 只返回实际新增的行
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*MENU_BUTTON_PERMISSIONS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'menu', COALESCE(t.description, ''), true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[]) AS t(code, name, resource, action, description)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions)
+        print(f"✅ 菜单按钮权限种子已写入（共 {len(MENU_BUTTON_PERMISSIONS)} 条，新增 {len(returned)} 条，code 已存在则跳过）")
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
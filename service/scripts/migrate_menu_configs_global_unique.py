@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+全局菜单配置（team_id 为 NULL）按 permission_id 唯一
+
+普通 UNIQUE(permission_id, team_id) 不约束 NULL，全局配置改由部分唯一索引 uq_menu_configs_perm_global 保证唯一，
+各菜单迁移的 ON CONFLICT (permission_id) WHERE team_id IS NULL 以其为冲突目标。
+建索引前清理历史重复的全局配置行：每个 permission_id 保留最早创建的一行，删除的行逐条输出。
+"""
+import asyncpg
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
+
+
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
+    """清理重复的全局菜单配置并创建部分唯一索引"""
+    try:
+        if await conn.fetchval("SELECT to_regclass('uq_menu_configs_perm_global') IS NOT NULL"):
+            print("⏭️  索引 uq_menu_configs_perm_global 已存在，跳过")
+            return
+
+        # 去重与建索引在同一事务中：建索引时持有的 SHARE 锁阻止并发写入，中间不会再出现新的重复行
+        removed = await conn.fetch("""
+            WITH ranked AS (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY permission_id ORDER BY created_at NULLS LAST, id
+                ) AS rn
+                FROM menu_configs
+                WHERE team_id IS NULL
+            )
+            DELETE FROM menu_configs m
+            USING ranked r
+            WHERE m.id = r.id AND r.rn > 1
+            RETURNING m.id, m.permission_id, m.parent_id, m.sort_order
+        """)
+        if removed:
+            print(f"⚠️  删除 {len(removed)} 条重复的全局菜单配置（每个 permission_id 保留最早创建的一条）:")
+            for row in removed:
+                print(
+                    f"   - id={row['id']} permission_id={row['permission_id']} "
+                    f"parent_id={row['parent_id']} sort_order={row['sort_order']}"
+                )
+
+        await conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_menu_configs_perm_global
+                ON menu_configs(permission_id) WHERE team_id IS NULL
+        """)
+        print("✅ 已创建全局菜单配置唯一索引 uq_menu_configs_perm_global")
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    run_migration(migrate)
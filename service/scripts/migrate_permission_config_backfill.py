@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+在全部菜单/接口种子迁移之后回填权限配置字段（type、is_system_admin_only、type_name、group_name）
+
+台账按校验和跳过未变化的迁移，migrate_permission_config_fields 不会因后续种子迁移新增权限而重跑；
+本迁移在 MIGRATION_DEPENDENCIES 中依赖全部写入 permissions 的种子迁移，任一种子迁移变化时随之重跑，补齐新权限的字段
+"""
+import asyncpg
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
+from scripts.migrate_permission_config_fields import backfill_permission_config_fields
+
+
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
+    try:
+        await backfill_permission_config_fields(conn)
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    run_migration(migrate)
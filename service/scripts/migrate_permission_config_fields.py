@@ -6,15 +6,11 @@
 - group_name: 分组名称，用于前端 groupBy
 - is_system_admin_only: 是否仅系统管理员可见，非系统管理员获取权限配置时过滤
 """
-import asyncio
-import sys
-from pathlib import Path
-
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 import asyncpg
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
 # resource -> group_name 映射
@@ -38,76 +34,74 @@ TYPE_TO_NAME = {
 }
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    try:
-        # 1. 添加新列
-        for col, col_type, default in [
-            ("is_system_admin_only", "BOOLEAN NOT NULL DEFAULT FALSE", ""),
-            ("type_name", "VARCHAR(50)", ""),
-            ("group_name", "VARCHAR(50)", ""),
-        ]:
-            exists = await conn.fetchval("""
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name = 'permissions' AND column_name = $1
-            """, col)
-            if not exists:
-                await conn.execute(f"ALTER TABLE permissions ADD COLUMN {col} {col_type}")
-                print(f"✅ 已添加列 permissions.{col}")
-            else:
-                print(f"⏭️  permissions.{col} 已存在，跳过")
-
-        # 2. 更新现有记录：按钮权限 type=button
-        button_actions = ("menu_create", "menu_update", "menu_delete", "menu_role_create", "menu_role_update", "menu_role_delete", "menu_user_role_assign")
-        await conn.execute("""
-            UPDATE permissions SET type = 'button'
-            WHERE type = 'menu' AND action = ANY($1::text[])
-        """, list(button_actions))
-        print("✅ 已将按钮类 action 的权限 type 更新为 button")
+async def backfill_permission_config_fields(conn: asyncpg.Connection) -> None:
+    """
+    按 type / resource / code 回填全部权限的 type、is_system_admin_only、type_name、group_name
 
-        # 3. 更新现有记录：is_system_admin_only
-        await conn.execute("""
-            UPDATE permissions SET is_system_admin_only = TRUE
-            WHERE code LIKE 'menu:team%' OR code LIKE 'menu:teams%' OR resource = 'teams'
-        """)
-        print("✅ 已设置团队管理相关权限 is_system_admin_only = TRUE")
-
-        # 4. 更新 type_name 和 group_name
-        rows = await conn.fetch("SELECT id, type, resource FROM permissions")
-        for row in rows:
-            type_name = TYPE_TO_NAME.get(row["type"], row["type"])
-            group_name = RESOURCE_TO_GROUP.get(row["resource"], row["resource"])
-            await conn.execute(
-                "UPDATE permissions SET type_name = $1, group_name = $2 WHERE id = $3",
-                type_name, group_name, row["id"]
-            )
-        print(f"✅ 已更新 {len(rows)} 条权限的 type_name 和 group_name")
+    各菜单/接口种子迁移写入的新权限不带这些字段，由 migrate_permission_config_backfill 在种子迁移之后再次执行
+    """
+    # 1. 更新现有记录：按钮权限 type=button
+    button_actions = ("menu_create", "menu_update", "menu_delete", "menu_role_create", "menu_role_update", "menu_role_delete", "menu_user_role_assign")
+    await conn.execute("""
+        UPDATE permissions SET type = 'button'
+        WHERE type = 'menu' AND action = ANY($1::text[])
+    """, list(button_actions))
+    print("✅ 已将按钮类 action 的权限 type 更新为 button")
 
-        # 5. 确保新列无空值
-        await conn.execute("""
-            UPDATE permissions SET type_name = COALESCE(NULLIF(TRIM(type_name), ''),
-                CASE type WHEN 'menu' THEN '菜单权限' WHEN 'api' THEN '接口权限' WHEN 'button' THEN '按钮权限' ELSE type END
+    # 2. 更新现有记录：is_system_admin_only
+    await conn.execute("""
+        UPDATE permissions SET is_system_admin_only = TRUE
+        WHERE code LIKE 'menu:team%' OR resource = 'teams'
+    """)
+    print("✅ 已设置团队管理相关权限 is_system_admin_only = TRUE")
+
+    # 3. 更新 type_name 和 group_name：映射表以并行数组传入，一条 UPDATE 全表完成，未命中映射时取原值
+    status = await conn.execute("""
+        UPDATE permissions AS p SET
+            type_name = COALESCE(
+                (SELECT t.type_name FROM unnest($1::text[], $2::text[]) AS t(type, type_name) WHERE t.type = p.type),
+                p.type
+            ),
+            group_name = COALESCE(
+                (SELECT g.group_name FROM unnest($3::text[], $4::text[]) AS g(resource, group_name) WHERE g.resource = p.resource),
+                p.resource
             )
-            WHERE type_name IS NULL OR TRIM(type_name) = ''
-        """)
+    """, list(TYPE_TO_NAME), list(TYPE_TO_NAME.values()), list(RESOURCE_TO_GROUP), list(RESOURCE_TO_GROUP.values()))
+    print(f"✅ 已更新 {status.split()[-1]} 条权限的 type_name 和 group_name")
+
+    # 4. 确保新列无空值
+    await conn.execute("""
+        UPDATE permissions SET type_name = COALESCE(NULLIF(TRIM(type_name), ''),
+            CASE type WHEN 'menu' THEN '菜单权限' WHEN 'api' THEN '接口权限' WHEN 'button' THEN '按钮权限' ELSE type END
+        )
+        WHERE type_name IS NULL OR TRIM(type_name) = ''
+    """)
+    await conn.execute("""
+        UPDATE permissions SET group_name = COALESCE(NULLIF(TRIM(group_name), ''), resource)
+        WHERE group_name IS NULL OR TRIM(group_name) = ''
+    """)
+    print("✅ 已补齐 type_name、group_name 空值")
+
+
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
+    try:
+        # 1. 添加新列：ADD COLUMN IF NOT EXISTS 本身幂等，无需预先查询 information_schema；三列合并为一条 ALTER TABLE
         await conn.execute("""
-            UPDATE permissions SET group_name = COALESCE(NULLIF(TRIM(group_name), ''), resource)
-            WHERE group_name IS NULL OR TRIM(group_name) = ''
+            ALTER TABLE permissions
+            ADD COLUMN IF NOT EXISTS is_system_admin_only BOOLEAN NOT NULL DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS type_name VARCHAR(50),
+            ADD COLUMN IF NOT EXISTS group_name VARCHAR(50)
         """)
-        print("✅ 已补齐 type_name、group_name 空值")
+        print("✅ permissions.is_system_admin_only、type_name、group_name 列已就绪")
+
+        # 2. 回填现有记录
+        await backfill_permission_config_fields(conn)
 
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
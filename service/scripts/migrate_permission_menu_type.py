@@ -3,10 +3,12 @@
 为权限表增加 type(menu/api)，并初始化菜单权限种子数据。
 包含：路由级（列表/入口）+ 按钮级（新建/编辑/删除等），均在「菜单分配」里按功能组展示。
 """
-import asyncio
-import uuid
 import asyncpg
-from app.core.config import settings
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from scripts._migrate_runtime import migration, run_migration
 
 
 # 菜单权限种子：code -> (name, resource, action, description)
@@ -35,47 +37,32 @@ MENU_BUTTON_PERMISSIONS = [
 MENU_PERMISSIONS = MENU_ROUTE_PERMISSIONS + MENU_BUTTON_PERMISSIONS
 
 
-async def migrate():
+@migration(transactional=True)
+async def migrate(conn: asyncpg.Connection):
     """增加 type 列并插入菜单权限"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-
     try:
-        # 1. 检查是否已有 type 列，没有则添加
-        col = await conn.fetchval("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_name = 'permissions' AND column_name = 'type'
+        # 1. 添加 type 列：IF NOT EXISTS 幂等，无需预先查询 information_schema；
+        #    带常量 DEFAULT 的 NOT NULL 列添加时已有行直接取默认值 api，无需再 UPDATE 回填
+        await conn.execute("""
+            ALTER TABLE permissions ADD COLUMN IF NOT EXISTS type VARCHAR(20) NOT NULL DEFAULT 'api'
         """)
-        if not col:
-            await conn.execute("""
-                ALTER TABLE permissions ADD COLUMN type VARCHAR(20) NOT NULL DEFAULT 'api'
-            """)
-            await conn.execute("UPDATE permissions SET type = 'api' WHERE type IS NULL OR type = ''")
-            print("✅ permissions.type 列已添加，默认值 api")
-        else:
-            print("⏭️ permissions.type 已存在，跳过")
+        print("✅ permissions.type 列已就绪，默认值 api")
 
-        # 2. 插入菜单权限（code 唯一，已存在则忽略）
-        for code, name, resource, action, description in MENU_PERMISSIONS:
-            pid = str(uuid.uuid4())
-            await conn.execute("""
-                INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, 'menu', $6, NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (code) DO NOTHING
-            """, pid, name, code, resource, action, description or "")
-        print(f"✅ 菜单权限种子已写入（路由 {len(MENU_ROUTE_PERMISSIONS)} 条 + 按钮 {len(MENU_BUTTON_PERMISSIONS)} 条，若 code 已存在则跳过）")
+        # 2. 插入菜单权限（code 唯一，已存在则忽略）：各列以并行数组传入，服务端 unnest 展开为多行一次写入
+        codes, names, resources, actions, descriptions = (list(col) for col in zip(*MENU_PERMISSIONS))
+        returned = await conn.fetch("""
+            INSERT INTO permissions (id, name, code, resource, action, type, description, parent_id, sort_order, is_active, created_at, updated_at)
+            SELECT gen_random_uuid()::text, t.name, t.code, t.resource, t.action, 'menu', COALESCE(t.description, ''), NULL, 0, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[]) AS t(code, name, resource, action, description)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code
+        """, codes, names, resources, actions, descriptions)
+        print(f"✅ 菜单权限种子已写入（路由 {len(MENU_ROUTE_PERMISSIONS)} 条 + 按钮 {len(MENU_BUTTON_PERMISSIONS)} 条，新增 {len(returned)} 条，若 code 已存在则跳过）")
 
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -4,13 +4,11 @@
 """
 import asyncio
 import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.database import AsyncSessionLocal, init_db, engine
+from app.core.database import engine
 from sqlalchemy import text
 
 
@@ -59,7 +57,6 @@ async def create_placeholder_data_sources_table():
 async def main():
     """主函数"""
     try:
-        await init_db()
         await create_placeholder_data_sources_table()
         print("\n迁移完成！")
     except Exception as e:
@@ -7,17 +7,12 @@
 - conversation.companyRagAbbr -> companyRagAbbr
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.database import AsyncSessionLocal, init_db, engine
-from app.models.prompt import Placeholder
-from sqlalchemy import text, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine, init_db
+from sqlalchemy import text
 
 
 # 占位符 key 映射关系
@@ -36,70 +31,67 @@ async def migrate_placeholder_keys():
     """更新占位符的 key 名称"""
     await init_db()
     
-    async with AsyncSessionLocal() as db:
-        try:
+    old_keys = list(PLACEHOLDER_KEY_MAPPING)
+    new_keys = list(PLACEHOLDER_KEY_MAPPING.values())
+    
+    try:
+        # 两条 UPDATE 在同一事务内执行，engine.begin() 退出时统一提交，异常时自动回滚
+        async with engine.begin() as conn:
             print("开始迁移占位符 key 名称...")
             
-            # 统计需要更新的占位符
-            updated_count = 0
-            
-            for old_key, new_key in PLACEHOLDER_KEY_MAPPING.items():
-                # 查找所有使用旧 key 的占位符
-                result = await db.execute(
-                    select(Placeholder).where(Placeholder.key == old_key)
-                )
-                placeholders = result.scalars().all()
-                
-                if placeholders:
-                    print(f"\n找到 {len(placeholders)} 个占位符需要更新: {old_key} -> {new_key}")
-                    
-                    for placeholder in placeholders:
-                        # 检查新 key 是否已存在（同一场景下）
-                        existing_result = await db.execute(
-                            select(Placeholder).where(
-                                Placeholder.key == new_key,
-                                Placeholder.scene == placeholder.scene
-                            )
+            # 映射表以并行数组传入，一条 UPDATE 完成全部改名：
+            # 同一场景下新 key 已存在的跳过；多个旧 key 映射到同一新 key 时，按映射顺序只改第一条
+            result = await conn.execute(
+                text("""
+                    WITH m AS (
+                        SELECT * FROM unnest(CAST(:old_keys AS text[]), CAST(:new_keys AS text[]))
+                            WITH ORDINALITY AS m(old_key, new_key, ord)
+                    ), candidates AS (
+                        SELECT DISTINCT ON (p.scene, m.new_key) p.id, m.old_key, m.new_key
+                        FROM placeholders p
+                        JOIN m ON p.key = m.old_key
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM placeholders p2 WHERE p2.key = m.new_key AND p2.scene IS NOT DISTINCT FROM p.scene
                         )
-                        existing = existing_result.scalar_one_or_none()
-                        
-                        if existing:
-                            print(f"  ⚠️  场景 {placeholder.scene} 中已存在 key={new_key} 的占位符，跳过更新 id={placeholder.id}")
-                            continue
-                        
-                        # 更新 key
-                        placeholder.key = new_key
-                        updated_count += 1
-                        print(f"  ✓ 更新占位符 id={placeholder.id}, scene={placeholder.scene}, label={placeholder.label}: {old_key} -> {new_key}")
+                        ORDER BY p.scene, m.new_key, m.ord, p.id
+                    )
+                    UPDATE placeholders p
+                    SET key = c.new_key
+                    FROM candidates c
+                    WHERE p.id = c.id
+                    RETURNING p.id, p.scene, p.label, c.old_key, c.new_key
+                """),
+                {"old_keys": old_keys, "new_keys": new_keys}
+            )
+            updated = result.fetchall()
+            for row in updated:
+                print(f"  ✓ 更新占位符 id={row.id}, scene={row.scene}, label={row.label}: {row.old_key} -> {row.new_key}")
             
-            if updated_count > 0:
-                await db.commit()
-                print(f"\n✓ 成功更新 {updated_count} 个占位符的 key")
+            if updated:
+                print(f"\n✓ 成功更新 {len(updated)} 个占位符的 key")
             else:
                 print("\n✓ 没有需要更新的占位符")
             
             # 同时更新 placeholder_data_sources 表中的 placeholder_key（如果存在）
-            async with engine.begin() as conn:
-                for old_key, new_key in PLACEHOLDER_KEY_MAPPING.items():
-                    result = await conn.execute(
-                        text("""
-                            UPDATE placeholder_data_sources 
-                            SET placeholder_key = :new_key 
-                            WHERE placeholder_key = :old_key
-                        """),
-                        {"old_key": old_key, "new_key": new_key}
-                    )
-                    if result.rowcount > 0:
-                        print(f"✓ 更新了 {result.rowcount} 条 placeholder_data_sources 记录: {old_key} -> {new_key}")
-            
-            print("\n迁移完成！")
-            
-        except Exception as e:
-            await db.rollback()
-            print(f"\n❌ 迁移失败: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
+            result = await conn.execute(
+                text("""
+                    UPDATE placeholder_data_sources AS d
+                    SET placeholder_key = m.new_key
+                    FROM unnest(CAST(:old_keys AS text[]), CAST(:new_keys AS text[])) AS m(old_key, new_key)
+                    WHERE d.placeholder_key = m.old_key
+                """),
+                {"old_keys": old_keys, "new_keys": new_keys}
+            )
+            if result.rowcount > 0:
+                print(f"✓ 更新了 {result.rowcount} 条 placeholder_data_sources 记录")
+        
+        print("\n迁移完成！")
+        
+    except Exception as e:
+        print(f"\n❌ 迁移失败: {e}")
+        import traceback
+        traceback.print_exc()
+        raise
 
 
 async def main():
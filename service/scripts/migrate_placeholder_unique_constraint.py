@@ -3,83 +3,85 @@
 数据库迁移脚本 - 修复 placeholders 表的唯一约束
 将 key 字段的全局唯一约束改为 (key, scene) 的组合唯一约束
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate_placeholder_constraint():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+@migration
+async def migrate_placeholder_constraint(conn: asyncpg.Connection):
     """迁移 placeholders 表的唯一约束"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         print("开始迁移 placeholders 表的唯一约束...")
         
-        # 检查旧的唯一约束是否存在
-        check_old_constraint = """
-        SELECT constraint_name 
-        FROM information_schema.table_constraints 
-        WHERE table_name = 'placeholders' 
-        AND constraint_name = 'placeholders_key_key';
-        """
-        old_constraint = await conn.fetch(check_old_constraint)
-        
-        # 检查是否有外键依赖
-        check_fk = """
-        SELECT constraint_name 
-        FROM information_schema.table_constraints 
-        WHERE table_name = 'placeholder_data_sources' 
-        AND constraint_type = 'FOREIGN KEY'
-        AND constraint_name LIKE '%placeholder_key%';
-        """
-        fk_constraints = await conn.fetch(check_fk)
-        
-        # 先删除外键约束（如果有）
-        if fk_constraints:
-            for fk in fk_constraints:
-                fk_name = fk['constraint_name']
-                print(f"删除外键约束 {fk_name}...")
-                await conn.execute(f"""
-                    ALTER TABLE placeholder_data_sources 
-                    DROP CONSTRAINT IF EXISTS {fk_name};
-                """)
-            print("✓ 删除外键约束成功")
-        
-        if old_constraint:
-            print("删除旧的唯一约束 placeholders_key_key...")
-            await conn.execute("""
-                ALTER TABLE placeholders 
-                DROP CONSTRAINT IF EXISTS placeholders_key_key CASCADE;
-            """)
-            print("✓ 删除旧约束成功")
-        else:
-            print("✓ 旧约束不存在，跳过删除")
-        
-        # 检查新的组合唯一约束是否已存在
-        check_new_constraint = """
-        SELECT constraint_name 
-        FROM information_schema.table_constraints 
-        WHERE table_name = 'placeholders' 
-        AND constraint_name = 'uq_placeholder_key_scene';
-        """
-        new_constraint = await conn.fetch(check_new_constraint)
+        # 一次查询 pg_constraint 得到新旧唯一约束是否存在及 placeholder_data_sources 上的相关外键，
+        # 按 conrelid 走索引，不再逐项查 information_schema 视图；外键名以 quote_ident 在服务端转义
+        state = await conn.fetchrow("""
+            SELECT
+                EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = 'placeholders'::regclass AND conname = 'placeholders_key_key'
+                ) AS old_constraint,
+                EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = 'placeholders'::regclass AND conname = 'uq_placeholder_key_scene'
+                ) AS new_constraint,
+                ARRAY(
+                    SELECT quote_ident(conname) FROM pg_constraint
+                    WHERE conrelid = to_regclass('placeholder_data_sources')
+                    AND contype = 'f'
+                    AND conname LIKE '%placeholder_key%'
+                    ORDER BY conname
+                ) AS fk_constraints
+        """)
+        old_constraint = state['old_constraint']
+        new_constraint = state['new_constraint']
+        fk_constraints = list(state['fk_constraints'])
         
+        # 先以 CONCURRENTLY 在线建好 (key, scene) 唯一索引（不阻塞写入，须在事务外执行），
+        # 再删除旧约束：删除与挂约束之间 key 始终受唯一索引保护
         if not new_constraint:
-            print("添加新的组合唯一约束 (key, scene)...")
-            await conn.execute("""
-                ALTER TABLE placeholders 
-                ADD CONSTRAINT uq_placeholder_key_scene UNIQUE (key, scene);
+            print("在线创建 (key, scene) 唯一索引...")
+            await create_index_concurrently(conn, "uq_placeholder_key_scene_idx", """
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_placeholder_key_scene_idx
+                ON placeholders (key, scene);
             """)
-            print("✓ 添加新约束成功")
-        else:
-            print("✓ 新约束已存在，跳过添加")
+            print("✓ 唯一索引创建成功")
+        
+        async with conn.transaction():
+            # 先删除外键约束（如果有）
+            if fk_constraints:
+                for fk_name in fk_constraints:
+                    print(f"删除外键约束 {fk_name}...")
+                    await conn.execute(f"""
+                        ALTER TABLE placeholder_data_sources 
+                        DROP CONSTRAINT IF EXISTS {fk_name};
+                    """)
+                print("✓ 删除外键约束成功")
+            
+            if old_constraint:
+                print("删除旧的唯一约束 placeholders_key_key...")
+                await conn.execute("""
+                    ALTER TABLE placeholders 
+                    DROP CONSTRAINT IF EXISTS placeholders_key_key CASCADE;
+                """)
+                print("✓ 删除旧约束成功")
+            else:
+                print("✓ 旧约束不存在，跳过删除")
+            
+            if not new_constraint:
+                print("添加新的组合唯一约束 (key, scene)...")
+                # USING INDEX 只改元数据，不再扫表建索引，表锁仅持有毫秒级
+                await conn.execute("""
+                    ALTER TABLE placeholders 
+                    ADD CONSTRAINT uq_placeholder_key_scene UNIQUE USING INDEX uq_placeholder_key_scene_idx;
+                """)
+                print("✓ 添加新约束成功")
+            else:
+                print("✓ 新约束已存在，跳过添加")
         
         # 重新添加外键约束（如果需要）
         # 注意：由于现在 key 不是全局唯一的，外键需要引用 (key, scene) 组合
@@ -94,14 +96,7 @@ async def migrate_placeholder_constraint():
     except Exception as e:
         print(f"迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
-
-
-async def main():
-    """主函数"""
-    await migrate_placeholder_constraint()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(migrate_placeholder_constraint)
@@ -2,22 +2,17 @@
 """
 为提示词表添加 team_code 字段的迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate_prompt_team_code():
+from scripts._migrate_runtime import migration, run_migration
+
+
+@migration
+async def migrate_prompt_team_code(conn: asyncpg.Connection):
     """为提示词表添加 team_code 字段"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         # 检查 team_code 字段是否已存在
         columns = await conn.fetch("""
@@ -48,8 +43,6 @@ async def migrate_prompt_team_code():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 async def main():
@@ -58,4 +51,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
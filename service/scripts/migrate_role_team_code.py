@@ -2,31 +2,55 @@
 """
 为角色表添加 team_code 字段的迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate_role_team_code():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+# 索引：(索引名, 语句)。以 CONCURRENTLY 在线创建，不阻塞 roles 写入；须在事务外逐条执行
+# 团队内唯一：name 和 code 在 team_code 内唯一；全局角色（team_code IS NULL）保持全局唯一
+ROLE_TEAM_INDEXES = [
+    ("idx_roles_team_code", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_team_code ON roles(team_code)"),
+    ("idx_roles_name_team_unique", """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_name_team_unique
+        ON roles(name, team_code)
+        WHERE team_code IS NOT NULL
+    """),
+    ("idx_roles_code_team_unique", """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_code_team_unique
+        ON roles(code, team_code)
+        WHERE team_code IS NOT NULL
+    """),
+    ("idx_roles_name_global_unique", """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_name_global_unique
+        ON roles(name)
+        WHERE team_code IS NULL
+    """),
+    ("idx_roles_code_global_unique", """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_code_global_unique
+        ON roles(code)
+        WHERE team_code IS NULL
+    """),
+]
+
+
+@migration
+async def migrate_role_team_code(conn: asyncpg.Connection):
     """为角色表添加 team_code 字段"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
-        # 检查 team_code 字段是否已存在
-        columns = await conn.fetch("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'roles' AND column_name = 'team_code'
+        # 检查 team_code 字段是否已存在：直接查 pg_attribute，走 (attrelid, attname) 索引
+        has_column = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = 'roles'::regclass AND attname = 'team_code'
+                AND attnum > 0 AND NOT attisdropped
+            )
         """)
         
-        if columns:
+        if has_column:
             print("✅ team_code 字段已存在，跳过迁移")
             return
         
@@ -38,72 +62,41 @@ async def migrate_role_team_code():
             ADD COLUMN team_code VARCHAR(50) NULL;
         """)
         
-        # 创建索引
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_roles_team_code ON roles(team_code);
-        """)
+        # 先建新的唯一索引再移除旧的全局唯一约束：旧约束保证全局唯一，新索引必然建成功，
+        # 且替换过程中 name/code 始终有唯一性保护
+        for index_name, sql in ROLE_TEAM_INDEXES:
+            await create_index_concurrently(conn, index_name, sql)
         
         # 移除 name 和 code 的唯一约束（因为现在在团队内唯一）
-        # 先检查约束是否存在
+        # 一次查询 pg_constraint 得到 roles 上全部唯一约束及其列，不再逐个约束查 information_schema；
+        # 约束名同时以 quote_ident 在服务端转义，拼入 DDL 时无需再查
         constraints = await conn.fetch("""
-            SELECT constraint_name 
-            FROM information_schema.table_constraints 
-            WHERE table_name = 'roles' 
-            AND constraint_type = 'UNIQUE'
+            SELECT con.conname AS constraint_name,
+                   quote_ident(con.conname) AS quoted_name,
+                   array_agg(att.attname ORDER BY u.ord) AS columns
+            FROM pg_constraint con
+            JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS u(attnum, ord) ON TRUE
+            JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = u.attnum
+            WHERE con.conrelid = 'roles'::regclass AND con.contype = 'u'
+            GROUP BY con.conname
         """)
         
         # 查找与 name 或 code 相关的唯一约束
         for constraint in constraints:
             constraint_name = constraint['constraint_name']
-            # 检查约束涉及的列
-            columns = await conn.fetch("""
-                SELECT column_name
-                FROM information_schema.key_column_usage
-                WHERE constraint_name = $1 AND table_name = 'roles'
-            """, constraint_name)
-            
-            col_names = [col['column_name'] for col in columns]
+            col_names = list(constraint['columns'])
             if 'name' in col_names or 'code' in col_names:
                 print(f"移除唯一约束: {constraint_name} (涉及列: {', '.join(col_names)})")
                 await conn.execute(f"""
                     ALTER TABLE roles 
-                    DROP CONSTRAINT IF EXISTS "{constraint_name}";
+                    DROP CONSTRAINT IF EXISTS {constraint['quoted_name']};
                 """)
         
-        # 创建团队内的唯一约束（name 和 code 在 team_code 内唯一）
-        # 注意：PostgreSQL 不支持部分唯一索引，所以我们需要使用表达式索引
-        await conn.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_roles_name_team_unique 
-            ON roles(name, team_code) 
-            WHERE team_code IS NOT NULL;
-        """)
-        
-        await conn.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_roles_code_team_unique 
-            ON roles(code, team_code) 
-            WHERE team_code IS NOT NULL;
-        """)
-        
-        # 对于全局角色（team_code IS NULL），保持唯一性
-        await conn.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_roles_name_global_unique 
-            ON roles(name) 
-            WHERE team_code IS NULL;
-        """)
-        
-        await conn.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_roles_code_global_unique 
-            ON roles(code) 
-            WHERE team_code IS NULL;
-        """)
-        
         print("✅ 迁移完成：已为 roles 表添加 team_code 字段和相关索引")
         
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 async def main():
@@ -112,4 +105,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
@@ -4,91 +4,65 @@
 将 code 的单独唯一约束改为 (code, team_id) 的联合唯一约束
 这样不同团队可以使用相同的场景代码
 """
-import asyncio
-import sys
-from pathlib import Path
 import asyncpg
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def migrate():
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+@migration
+async def migrate(conn: asyncpg.Connection):
     try:
         print("开始修改 scenes 表的唯一约束...")
         
-        # 1. 检查是否存在 code 的唯一约束
-        constraints = await conn.fetch("""
-            SELECT constraint_name, constraint_type
-            FROM information_schema.table_constraints
-            WHERE table_name = 'scenes'
-            AND constraint_type = 'UNIQUE'
+        # 1. 一次查询取得 scenes 上全部唯一索引（含背后的约束名、是否仅含 code 列），
+        #    后续 DDL 均据此结果在 Python 中决定，不再分步探测；
+        #    名称在服务端转为可直接拼入 DDL 的标识符（regclass::text 与 quote_ident 按需加引号）
+        unique_indexes = await conn.fetch("""
+            SELECT i.indexrelid::regclass::text AS index_name,
+                   quote_ident(con.conname) AS conname,
+                   i.indnatts = 1 AND i.indkey[0] = (
+                       SELECT attnum FROM pg_attribute
+                       WHERE attrelid = 'scenes'::regclass AND attname = 'code'
+                   ) AS is_code_only
+            FROM pg_index i
+            LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.contype = 'u'
+            WHERE i.indrelid = 'scenes'::regclass
+            AND i.indisunique
+            AND NOT i.indisprimary
         """)
+        code_unique_indexes = [row for row in unique_indexes if row['is_code_only']]
+        has_composite_index = any(row['index_name'] == 'idx_scenes_code_team_id_unique' for row in unique_indexes)
         
-        code_unique_constraint = None
-        for constraint in constraints:
-            # 检查约束是否只包含 code 列
-            constraint_columns = await conn.fetch("""
-                SELECT column_name
-                FROM information_schema.constraint_column_usage
-                WHERE constraint_name = $1 AND table_name = 'scenes'
-            """, constraint['constraint_name'])
+        # 2~4. 删除 code 的单独唯一约束/索引并创建联合唯一索引 (code, team_id)，同一事务内完成
+        async with conn.transaction():
+            if not code_unique_indexes:
+                print("✓ 不存在 code 的单独唯一约束/索引")
+            for row in code_unique_indexes:
+                if row['conname']:
+                    print(f"删除 code 的唯一约束: {row['conname']}")
+                    await conn.execute(f'ALTER TABLE scenes DROP CONSTRAINT IF EXISTS {row["conname"]}')
+                else:
+                    print(f"删除唯一索引: {row['index_name']}")
+                    await conn.execute(f'DROP INDEX IF EXISTS {row["index_name"]}')
             
-            columns = [col['column_name'] for col in constraint_columns]
-            if len(columns) == 1 and columns[0] == 'code':
-                code_unique_constraint = constraint['constraint_name']
-                break
-        
-        # 2. 删除 code 的单独唯一约束
-        if code_unique_constraint:
-            print(f"删除 code 的唯一约束: {code_unique_constraint}")
-            await conn.execute(f'ALTER TABLE scenes DROP CONSTRAINT IF EXISTS {code_unique_constraint}')
-        else:
-            # 如果没有找到命名约束，可能是通过 UNIQUE 关键字创建的，尝试删除索引
-            indexes = await conn.fetch("""
-                SELECT indexname
-                FROM pg_indexes
-                WHERE tablename = 'scenes' AND indexdef LIKE '%UNIQUE%code%'
-            """)
-            for index in indexes:
-                print(f"删除唯一索引: {index['indexname']}")
-                await conn.execute(f'DROP INDEX IF EXISTS {index["indexname"]}')
-        
-        # 3. 检查是否已存在联合唯一索引
-        existing_index = await conn.fetchrow("""
-            SELECT indexname
-            FROM pg_indexes
-            WHERE tablename = 'scenes'
-            AND indexname = 'idx_scenes_code_team_id_unique'
-        """)
-        
-        # 4. 创建联合唯一约束 (code, team_id)
-        if not existing_index:
-            print("创建联合唯一索引: (code, team_id)")
-            await conn.execute("""
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_scenes_code_team_id_unique
-                ON scenes(code, team_id)
-            """)
-            print("✅ 联合唯一索引创建成功")
-        else:
-            print(f"✅ 联合唯一索引已存在: {existing_index['indexname']}")
+            if not has_composite_index:
+                print("创建联合唯一索引: (code, team_id)")
+                await conn.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_scenes_code_team_id_unique
+                    ON scenes(code, team_id)
+                """)
+                print("✅ 联合唯一索引创建成功")
+            else:
+                print("✅ 联合唯一索引已存在: idx_scenes_code_team_id_unique")
         
         # 5. 验证索引
         final_indexes = await conn.fetch("""
-            SELECT indexname, indexdef
-            FROM pg_indexes
-            WHERE tablename = 'scenes'
-            AND indexdef LIKE '%UNIQUE%'
+            SELECT i.indexrelid::regclass::text AS indexname, pg_get_indexdef(i.indexrelid) AS indexdef
+            FROM pg_index i
+            WHERE i.indrelid = 'scenes'::regclass AND i.indisunique
         """)
         print("\n当前 scenes 表的唯一索引:")
         for idx in final_indexes:
@@ -99,9 +73,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
@@ -4,99 +4,89 @@
 将 code 字段的唯一约束改为只在 is_active=True 时唯一，允许已删除的记录（is_active=False）重复使用 code
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.database import AsyncSessionLocal, engine
+from scripts._migrate_runtime import create_index_concurrently
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 async def migrate():
     """修改 code 字段的唯一约束为部分唯一索引"""
+    # CREATE/DROP INDEX CONCURRENTLY 在线执行不阻塞写入，但不能在事务块中运行，使用 AUTOCOMMIT 连接
+    autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
     async with AsyncSessionLocal() as session:
         try:
-            # 1. 检查是否存在旧的唯一约束或索引
-            check_constraint_sql = """
-            SELECT constraint_name 
-            FROM information_schema.table_constraints 
-            WHERE table_name = 'multi_dimension_tables' 
-            AND constraint_type = 'UNIQUE' 
-            AND constraint_name LIKE '%code%';
-            """
-            
-            check_index_sql = """
-            SELECT indexname 
-            FROM pg_indexes 
-            WHERE tablename = 'multi_dimension_tables' 
-            AND indexname LIKE '%code%';
+            # 1. 一次查询 pg_catalog 取得包含 code 列的唯一约束（按约束列判断，不依赖约束命名）
+            #    与名称含 code 的索引（替代两次 information_schema 扫描 + pg_indexes）
+            #    约束名以 quote_ident 转义，后续可直接拼入 DROP CONSTRAINT
+            check_sql = """
+            SELECT 'constraint' AS kind, con.conname AS name, quote_ident(con.conname) AS quoted_name
+            FROM pg_constraint con
+            WHERE con.conrelid = 'multi_dimension_tables'::regclass
+            AND con.contype = 'u'
+            AND (
+                SELECT attnum FROM pg_attribute
+                WHERE attrelid = 'multi_dimension_tables'::regclass AND attname = 'code'
+            ) = ANY(con.conkey)
+            UNION ALL
+            SELECT 'index', c.relname, quote_ident(c.relname)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = 'multi_dimension_tables'::regclass
+            AND c.relname LIKE '%code%';
             """
             
-            # 检查约束
-            result = await session.execute(text(check_constraint_sql))
-            constraints = result.fetchall()
-            
-            # 检查索引
-            result = await session.execute(text(check_index_sql))
-            indexes = result.fetchall()
+            result = await session.execute(text(check_sql))
+            rows = result.fetchall()
+            constraints = [row for row in rows if row.kind == 'constraint']
+            indexes = [row for row in rows if row.kind == 'index']
             
             print("检查现有的约束和索引...")
             if constraints:
-                print(f"找到唯一约束: {[c[0] for c in constraints]}")
+                print(f"找到唯一约束: {[c.name for c in constraints]}")
             if indexes:
-                print(f"找到索引: {[i[0] for i in indexes]}")
+                print(f"找到索引: {[i.name for i in indexes]}")
+            await session.commit()
             
-            # 2. 删除旧的唯一约束和索引（如果存在）
-            # PostgreSQL 中，unique=True 会创建一个唯一约束，名称通常是 "multi_dimension_tables_code_key" 或类似
-            # 先获取所有相关的约束名称
-            get_constraints_sql = """
-            SELECT constraint_name 
-            FROM information_schema.table_constraints 
-            WHERE table_name = 'multi_dimension_tables' 
-            AND constraint_type = 'UNIQUE' 
-            AND (
-                constraint_name LIKE '%code%' 
-                OR constraint_name = 'multi_dimension_tables_code_key'
-            );
+            # 2. 先创建部分唯一索引（只在 is_active=True 时唯一），再删除旧约束，替换过程中 code 始终有唯一性保护
+            create_partial_index_sql = """
+            CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_tables_code_active 
+            ON multi_dimension_tables (code) 
+            WHERE is_active = TRUE;
             """
+            # 经底层 asyncpg 连接调用 create_index_concurrently：上次构建中断留下的 INVALID 索引会被重建，
+            # 构建后索引仍无效则抛出异常，不会继续删除旧约束
+            async with autocommit_engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                await create_index_concurrently(
+                    raw.driver_connection, "idx_multi_dimension_tables_code_active", create_partial_index_sql
+                )
+            print("✅ 已创建部分唯一索引（只在 is_active=True 时唯一）")
             
-            result = await session.execute(text(get_constraints_sql))
-            constraint_names = [row[0] for row in result.fetchall()]
-            
-            # 删除所有找到的唯一约束
-            for constraint_name in constraint_names:
+            # 3. 删除旧的唯一约束和索引（如果存在）
+            # PostgreSQL 中，unique=True 会创建一个唯一约束，名称通常是 "multi_dimension_tables_code_key" 或类似
+            # 约束列表取自步骤 1 的查询结果，无需再次查询
+            for constraint in constraints:
                 drop_constraint_sql = f"""
                 ALTER TABLE multi_dimension_tables 
-                DROP CONSTRAINT IF EXISTS {constraint_name};
+                DROP CONSTRAINT IF EXISTS {constraint.quoted_name};
                 """
                 await session.execute(text(drop_constraint_sql))
-                print(f"✅ 已删除唯一约束: {constraint_name}")
-            
-            # 删除可能存在的唯一索引（包括所有可能的名称变体）
-            # 注意：需要分别执行，因为 prepared statement 不支持多个命令
-            drop_index1_sql = "DROP INDEX IF EXISTS idx_multi_dimension_tables_code;"
-            drop_index2_sql = "DROP INDEX IF EXISTS ix_multi_dimension_tables_code;"
-            await session.execute(text(drop_index1_sql))
-            await session.execute(text(drop_index2_sql))
-            print("✅ 已删除旧的唯一索引（如果存在）")
+                print(f"✅ 已删除唯一约束: {constraint.name}")
             
             await session.commit()
             print("✅ 已提交删除操作")
             
-            # 3. 创建部分唯一索引（只在 is_active=True 时唯一）
-            create_partial_index_sql = """
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_multi_dimension_tables_code_active 
-            ON multi_dimension_tables (code) 
-            WHERE is_active = TRUE;
-            """
-            
-            await session.execute(text(create_partial_index_sql))
-            await session.commit()
-            print("✅ 已创建部分唯一索引（只在 is_active=True 时唯一）")
+            # 删除可能存在的唯一索引（包括所有可能的名称变体）
+            # 注意：需要分别执行，DROP INDEX CONCURRENTLY 一次只能删除一个索引
+            async with autocommit_engine.connect() as conn:
+                await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_multi_dimension_tables_code;"))
+                await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_multi_dimension_tables_code;"))
+            print("✅ 已删除旧的唯一索引（如果存在）")
             
             # 4. 验证索引创建成功
             verify_sql = """
@@ -5,14 +5,12 @@
 允许不同团队使用相同的 code，已删除的记录（is_active=False）允许重复使用 code
 """
 import asyncio
-import sys
-from pathlib import Path
 
-# 添加项目根目录到 Python 路径
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 from app.core.database import AsyncSessionLocal, engine
+from scripts._migrate_runtime import create_index_concurrently
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,12 +19,17 @@ async def migrate():
     """修改 code 字段的唯一约束为按团队的部分唯一索引"""
     async with AsyncSessionLocal() as session:
         try:
-            # 1. 检查是否存在旧的唯一索引
+            # 1. 检查是否存在旧的唯一索引，同时取服务端版本
+            # PostgreSQL 15+ 支持 NULLS NOT DISTINCT：普通列索引即可让 team_id 为 NULL 的记录参与唯一判断，
+            # 无需 COALESCE 表达式（写入时不再计算表达式，按 code/team_id 的普通查询也能用上该索引）
+            version_sql = "SELECT current_setting('server_version_num')::int >= 150000;"
+            nulls_not_distinct = (await session.execute(text(version_sql))).scalar()
+            
             check_index_sql = """
-            SELECT indexname, indexdef 
-            FROM pg_indexes 
-            WHERE tablename = 'multi_dimension_tables' 
-            AND indexname = 'idx_multi_dimension_tables_code_active';
+            SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indexrelid = to_regclass('idx_multi_dimension_tables_code_active');
             """
             
             result = await session.execute(text(check_index_sql))
@@ -36,31 +39,50 @@ async def migrate():
                 print(f"找到现有索引: {index_info[0]}")
                 print(f"定义: {index_info[1]}")
                 
-                # 检查索引是否已经包含 team_id
-                if 'team_id' in index_info[1]:
+                # 检查索引是否已经包含 team_id（PG 15+ 还须为 NULLS NOT DISTINCT 形式）；
+                # 无效索引（并发构建中断留下）不算已完成，按下方流程重建后替换
+                if not index_info[2]:
+                    print("⚠️  现有索引无效，将重建")
+                elif 'team_id' in index_info[1] and (not nulls_not_distinct or 'NULLS NOT DISTINCT' in index_info[1]):
                     print("✅ 索引已包含 team_id，无需修改")
                     return
             else:
                 print("⚠️  未找到索引 idx_multi_dimension_tables_code_active")
             
-            # 2. 删除旧的唯一索引
-            drop_index_sql = "DROP INDEX IF EXISTS idx_multi_dimension_tables_code_active;"
-            await session.execute(text(drop_index_sql))
             await session.commit()
-            print("✅ 已删除旧的唯一索引")
             
-            # 3. 创建新的部分唯一索引（包含 team_id）
-            # 对于 team_id 为 NULL 的情况，使用 COALESCE 处理
-            # PostgreSQL 的部分唯一索引需要处理 NULL 值
-            create_partial_index_sql = """
-            CREATE UNIQUE INDEX idx_multi_dimension_tables_code_active 
-            ON multi_dimension_tables (code, COALESCE(team_id, '')) 
-            WHERE is_active = TRUE;
-            """
+            # 2. 以临时名在线创建新的部分唯一索引（包含 team_id），再删除旧索引并改名：
+            #    CONCURRENTLY 不阻塞写入（须在事务外，使用 AUTOCOMMIT 连接），替换过程中 code 始终有唯一性保护
+            # 对于 team_id 为 NULL 的情况：PG 15+ 使用 NULLS NOT DISTINCT，更早版本使用 COALESCE 处理
+            if nulls_not_distinct:
+                create_partial_index_sql = """
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_tables_code_active_new 
+                ON multi_dimension_tables (code, team_id) NULLS NOT DISTINCT 
+                WHERE is_active = TRUE;
+                """
+            else:
+                create_partial_index_sql = """
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_multi_dimension_tables_code_active_new 
+                ON multi_dimension_tables (code, COALESCE(team_id, '')) 
+                WHERE is_active = TRUE;
+                """
             
-            await session.execute(text(create_partial_index_sql))
-            await session.commit()
-            print("✅ 已创建新的部分唯一索引（包含 team_id）")
+            autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+            # 经底层 asyncpg 连接调用 create_index_concurrently：上次中断留下的 INVALID _new 索引会被删除重建，
+            # 构建后仍无效则抛出异常，不会删除旧索引、也不会把无效索引改名替换上去
+            async with autocommit_engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                await create_index_concurrently(
+                    raw.driver_connection, "idx_multi_dimension_tables_code_active_new", create_partial_index_sql
+                )
+                print("✅ 已创建新的部分唯一索引（包含 team_id）")
+                
+                # 3. 删除旧的唯一索引，新索引改用原名称
+                await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_multi_dimension_tables_code_active;"))
+                print("✅ 已删除旧的唯一索引")
+                await conn.execute(text(
+                    "ALTER INDEX idx_multi_dimension_tables_code_active_new RENAME TO idx_multi_dimension_tables_code_active;"
+                ))
             
             # 4. 验证索引创建成功
             verify_sql = """
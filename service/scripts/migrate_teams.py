@@ -2,21 +2,17 @@
 """
 创建团队表和添加用户 team_code 字段的数据库迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+@migration
+async def migrate(conn: asyncpg.Connection):
     """创建团队表和添加用户 team_code 字段"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         # 创建团队表
         await conn.execute("""
@@ -29,9 +25,11 @@ async def migrate():
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
             );
-            
-            CREATE INDEX IF NOT EXISTS idx_teams_code ON teams(code);
         """)
+        # 索引以 CONCURRENTLY 在线创建，不阻塞写入；须在事务外单独执行
+        await create_index_concurrently(
+            conn, "idx_teams_code", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_teams_code ON teams(code);"
+        )
         
         # 检查 users 表是否存在 team_code 字段
         columns = await conn.fetch("""
@@ -45,21 +43,22 @@ async def migrate():
             await conn.execute("""
                 ALTER TABLE users 
                 ADD COLUMN team_code VARCHAR;
-                
-                CREATE INDEX IF NOT EXISTS idx_users_team_code ON users(team_code);
             """)
             print("✅ 已添加 users.team_code 字段")
         else:
             print("ℹ️  users.team_code 字段已存在")
+        # 不以字段是否已存在为条件：加列后索引构建中断时，下次运行仍会重建留下的 INVALID 索引
+        await create_index_concurrently(
+            conn, "idx_users_team_code",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_team_code ON users(team_code);",
+        )
         
         print("✅ 团队表和用户 team_code 字段迁移完成")
         
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
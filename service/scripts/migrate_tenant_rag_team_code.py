@@ -2,74 +2,63 @@
 """
 为租户表和RAG表添加 team_code 字段的迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate_tenant_rag_team_code():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+@migration
+async def migrate_tenant_rag_team_code(conn: asyncpg.Connection):
     """为租户表和RAG表添加 team_code 字段"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
-        # 检查 tenants 表的 team_code 字段是否已存在
-        tenant_columns = await conn.fetch("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'tenants' AND column_name = 'team_code'
-        """)
+        # 一次查询取得 tenants / rags 中已有 team_code 字段的表
+        tables_with_column = {
+            row['table_name'] for row in await conn.fetch("""
+                SELECT attrelid::regclass::text AS table_name
+                FROM pg_attribute
+                WHERE attrelid IN ('tenants'::regclass, 'rags'::regclass)
+                AND attname = 'team_code'
+                AND attnum > 0 AND NOT attisdropped
+            """)
+        }
         
-        if not tenant_columns:
+        if 'tenants' not in tables_with_column:
             print("开始迁移：为 tenants 表添加 team_code 字段...")
-            # 添加 team_code 字段
             await conn.execute("""
                 ALTER TABLE tenants 
                 ADD COLUMN team_code VARCHAR(50) NULL;
             """)
-            
-            # 创建索引
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tenants_team_code ON tenants(team_code);
-            """)
-            print("✅ 迁移完成：已为 tenants 表添加 team_code 字段和相关索引")
+            print("✅ 迁移完成：已为 tenants 表添加 team_code 字段")
         else:
             print("✅ tenants 表的 team_code 字段已存在，跳过迁移")
         
-        # 检查 rags 表的 team_code 字段是否已存在
-        rag_columns = await conn.fetch("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'rags' AND column_name = 'team_code'
-        """)
-        
-        if not rag_columns:
+        if 'rags' not in tables_with_column:
             print("开始迁移：为 rags 表添加 team_code 字段...")
-            # 添加 team_code 字段
             await conn.execute("""
                 ALTER TABLE rags 
                 ADD COLUMN team_code VARCHAR(50) NULL;
             """)
-            
-            # 创建索引
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rags_team_code ON rags(team_code);
-            """)
-            print("✅ 迁移完成：已为 rags 表添加 team_code 字段和相关索引")
+            print("✅ 迁移完成：已为 rags 表添加 team_code 字段")
         else:
             print("✅ rags 表的 team_code 字段已存在，跳过迁移")
         
+        # 索引以 CONCURRENTLY 在线创建，不阻塞写入，须在事务外单独执行；
+        # 不以字段是否已存在为条件：加列后索引构建中断时，下次运行仍会重建留下的 INVALID 索引
+        await create_index_concurrently(
+            conn, "idx_tenants_team_code",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tenants_team_code ON tenants(team_code);",
+        )
+        await create_index_concurrently(
+            conn, "idx_rags_team_code",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rags_team_code ON rags(team_code);",
+        )
+        
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 async def main():
@@ -78,4 +67,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
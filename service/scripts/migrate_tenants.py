@@ -3,111 +3,80 @@
 数据库迁移脚本 - 更新 tenants 表结构
 添加 code_id, created_by, updated_by, is_deleted 字段
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate_tenants_table():
+from scripts._migrate_runtime import create_index_concurrently, migration, run_migration
+
+
+@migration
+async def migrate_tenants_table(conn: asyncpg.Connection):
     """迁移 tenants 表，添加新字段"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
-        # 检查 code_id 字段是否存在
-        check_query = """
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'tenants' AND column_name = 'code_id';
-        """
-        result = await conn.fetch(check_query)
+        # 四个字段是否存在一次查询取得（pg_attribute 按 attrelid 走索引），后续按集合分支
+        existing = {
+            row['attname'] for row in await conn.fetch("""
+                SELECT attname
+                FROM pg_attribute
+                WHERE attrelid = 'tenants'::regclass
+                AND attname = ANY($1::text[])
+                AND attnum > 0 AND NOT attisdropped
+            """, ['code_id', 'created_by', 'updated_by', 'is_deleted'])
+        }
         
-        if not result:
+        if 'code_id' not in existing:
             print("开始迁移 tenants 表...")
             
-            # 添加新字段
+            # 加列、回填、设 NOT NULL 合并为一个无参数脚本：简单查询协议一次往返执行，
+            # 多条语句在同一隐式事务中，任一步失败整体回滚
             await conn.execute("""
                 ALTER TABLE tenants 
                 ADD COLUMN IF NOT EXISTS code_id VARCHAR UNIQUE;
-            """)
-            
-            # 为现有数据设置默认 code_id（使用 id）
-            await conn.execute("""
+                
+                -- 为现有数据设置默认 code_id（使用 id）
                 UPDATE tenants 
                 SET code_id = 'tenant-' || id 
                 WHERE code_id IS NULL;
-            """)
-            
-            # 设置 code_id 为 NOT NULL
-            await conn.execute("""
+                
                 ALTER TABLE tenants 
                 ALTER COLUMN code_id SET NOT NULL;
             """)
-            
-            # 创建索引
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tenants_code_id ON tenants(code_id);
-            """)
-            
             print("✓ 添加 code_id 字段成功")
         else:
             print("✓ code_id 字段已存在")
         
-        # 检查 created_by 字段
-        check_created_by = """
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'tenants' AND column_name = 'created_by';
-        """
-        if not await conn.fetch(check_created_by):
-            await conn.execute("""
-                ALTER TABLE tenants 
-                ADD COLUMN IF NOT EXISTS created_by VARCHAR;
-            """)
-            print("✓ 添加 created_by 字段成功")
-        else:
-            print("✓ created_by 字段已存在")
-        
-        # 检查 updated_by 字段
-        check_updated_by = """
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'tenants' AND column_name = 'updated_by';
-        """
-        if not await conn.fetch(check_updated_by):
-            await conn.execute("""
-                ALTER TABLE tenants 
-                ADD COLUMN IF NOT EXISTS updated_by VARCHAR;
-            """)
-            print("✓ 添加 updated_by 字段成功")
-        else:
-            print("✓ updated_by 字段已存在")
+        # 缺失的审计/软删除字段合并为一条 ALTER TABLE（多个 ADD COLUMN 子句），一次往返、只取一次表锁；
+        # is_deleted 以常量默认值 + NOT NULL 添加：PG 11+ 仅改元数据，不重写表，存量行直接视为 FALSE
+        simple_columns = [
+            ('created_by', 'VARCHAR'),
+            ('updated_by', 'VARCHAR'),
+            ('is_deleted', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+        ]
+        missing = [(name, ddl) for name, ddl in simple_columns if name not in existing]
+        if missing:
+            await conn.execute(
+                "ALTER TABLE tenants "
+                + ", ".join(f"ADD COLUMN IF NOT EXISTS {name} {ddl}" for name, ddl in missing)
+                + ";"
+            )
+        for name, _ in simple_columns:
+            if name in existing:
+                print(f"✓ {name} 字段已存在")
+            else:
+                print(f"✓ 添加 {name} 字段成功")
         
-        # 检查 is_deleted 字段
-        check_is_deleted = """
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'tenants' AND column_name = 'is_deleted';
-        """
-        if not await conn.fetch(check_is_deleted):
-            await conn.execute("""
-                ALTER TABLE tenants 
-                ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE;
-            """)
-            
-            # 创建索引
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tenants_is_deleted ON tenants(is_deleted);
-            """)
-            print("✓ 添加 is_deleted 字段成功")
-        else:
-            print("✓ is_deleted 字段已存在")
+        # CONCURRENTLY 在线建索引不阻塞写入；不能放在多语句脚本（隐式事务）中，须单独执行。
+        # 不以字段是否已存在为条件：加列后索引构建中断时，下次运行仍会重建留下的 INVALID 索引
+        await create_index_concurrently(
+            conn, "idx_tenants_code_id",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tenants_code_id ON tenants(code_id);",
+        )
+        await create_index_concurrently(
+            conn, "idx_tenants_is_deleted",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tenants_is_deleted ON tenants(is_deleted);",
+        )
         
         # 移除 name 的唯一约束（如果存在），因为现在 code_id 是唯一的
         try:
@@ -124,10 +93,8 @@ async def migrate_tenants_table():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate_tenants_table())
+    run_migration(migrate_tenants_table)
 
@@ -3,72 +3,64 @@
 更新菜单权限的名称
 将菜单名称改为更简洁的格式
 """
-import asyncio
 import asyncpg
-import sys
-import os
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-from app.core.config import settings
+from scripts._migrate_runtime import migration, run_migration
 
 
-async def update_menu_names():
+@migration
+async def update_menu_names(conn: asyncpg.Connection):
     """更新菜单权限的名称"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
+    print("\n开始更新菜单权限名称...")
     
-    try:
-        print("\n开始更新菜单权限名称...")
-        
-        # 定义菜单 code 到新名称的映射
-        menu_name_updates = [
-            ("menu:tenant:list", "租户列表"),
-            ("menu:prompts:list", "提示词列表"),
-            ("menu:rbac", "权限管理"),
-        ]
-        
-        updated_count = 0
-        
-        for code, new_name in menu_name_updates:
-            # 检查菜单是否存在
-            existing = await conn.fetchrow("""
-                SELECT id, name FROM permissions WHERE code = $1
-            """, code)
-            
-            if not existing:
-                print(f"⏭️  跳过 {code}：菜单权限不存在")
-                continue
-            
-            old_name = existing['name']
-            
-            if old_name == new_name:
-                print(f"⏭️  跳过 {code}：名称已经是 {new_name}")
-                continue
-            
-            # 更新名称
-            await conn.execute("""
-                UPDATE permissions 
-                SET name = $1, updated_at = CURRENT_TIMESTAMP
-                WHERE code = $2
-            """, new_name, code)
-            
+    # 定义菜单 code 到新名称的映射
+    menu_name_updates = [
+        ("menu:tenant:list", "租户列表"),
+        ("menu:prompts:list", "提示词列表"),
+        ("menu:rbac", "权限管理"),
+    ]
+    
+    # 映射以并行数组传入，一条 UPDATE ... FROM unnest 完成全部改名（名称未变的行不更新）；
+    # 同一语句 LEFT JOIN 原记录（语句快照中为改名前的值），得到每个菜单的处理情况，不再逐条 SELECT + UPDATE
+    codes = [code for code, _ in menu_name_updates]
+    new_names = [new_name for _, new_name in menu_name_updates]
+    rows = await conn.fetch("""
+        WITH m AS (
+            SELECT * FROM unnest($1::text[], $2::text[]) WITH ORDINALITY AS m(code, new_name, ord)
+        ),
+        updated AS (
+            UPDATE permissions p
+            SET name = m.new_name, updated_at = CURRENT_TIMESTAMP
+            FROM m
+            WHERE p.code = m.code AND p.name IS DISTINCT FROM m.new_name
+            RETURNING p.code
+        )
+        SELECT m.code, m.new_name, p.code IS NOT NULL AS menu_exists, p.name AS old_name,
+               EXISTS (SELECT 1 FROM updated u WHERE u.code = m.code) AS is_updated
+        FROM m
+        LEFT JOIN permissions p ON p.code = m.code
+        ORDER BY m.ord
+    """, codes, new_names)
+    
+    updated_count = 0
+    
+    for row in rows:
+        code, new_name = row['code'], row['new_name']
+        if not row['menu_exists']:
+            print(f"⏭️  跳过 {code}：菜单权限不存在")
+        elif row['is_updated']:
             updated_count += 1
-            print(f"✅ 已更新 {code}: {old_name} -> {new_name}")
-        
-        print(f"\n{'='*60}")
-        print(f"✅ 迁移完成")
-        print(f"   - 已更新: {updated_count} 个菜单权限名称")
-        print(f"{'='*60}\n")
-        
-    finally:
-        await conn.close()
+            print(f"✅ 已更新 {code}: {row['old_name']} -> {new_name}")
+        else:
+            print(f"⏭️  跳过 {code}：名称已经是 {new_name}")
+    
+    print(f"\n{'='*60}")
+    print(f"✅ 迁移完成")
+    print(f"   - 已更新: {updated_count} 个菜单权限名称")
+    print(f"{'='*60}\n")
 
 
 async def main():
@@ -77,4 +69,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
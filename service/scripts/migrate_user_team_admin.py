@@ -2,21 +2,17 @@
 """
 添加用户 is_team_admin 字段的数据库迁移脚本
 """
-import asyncio
 import asyncpg
-from app.core.config import settings
 
+if not __package__:
+    import _bootstrap  # noqa: F401
 
-async def migrate():
+from scripts._migrate_runtime import migration, run_migration
+
+
+@migration
+async def migrate(conn: asyncpg.Connection):
     """添加 is_team_admin 字段"""
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
         # 检查 users 表是否存在 is_team_admin 字段
         columns = await conn.fetch("""
@@ -40,9 +36,7 @@ async def migrate():
     except Exception as e:
         print(f"❌ 迁移失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    run_migration(migrate)
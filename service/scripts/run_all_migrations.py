@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RBAC/菜单 迁移编排：按依赖分层执行 MIGRATIONS，同层迁移并发，所有迁移共用一个 asyncpg 连接池
+用法: cd service && PYTHONPATH=. python scripts/run_all_migrations.py
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
+from app.core.migration_config import MIGRATION_DEPENDENCIES, MIGRATIONS
+from scripts import _ledger
+from scripts._migrate_runtime import close_pool, with_conn
+
+
+def build_layers() -> List[List[str]]:
+    """
+    按 MIGRATION_DEPENDENCIES 将 MIGRATIONS 拓扑分层
+
+    每层内的迁移互不依赖，层内保持 MIGRATIONS 中的相对顺序。
+    """
+    names = [mod_name for mod_name, _ in MIGRATIONS]
+    known = set(names)
+    level: Dict[str, int] = {}
+    for name in names:
+        deps = [d for d in MIGRATION_DEPENDENCIES.get(name, []) if d in known]
+        missing = [d for d in deps if d not in level]
+        if missing:
+            raise ValueError(f"迁移 {name} 的依赖 {missing} 须排在其之前（见 MIGRATIONS）")
+        level[name] = max((level[d] + 1 for d in deps), default=0)
+    layers: List[List[str]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for name in names:
+        layers[level[name]].append(name)
+    return layers
+
+
+def _load(mod_name: str, ledger_checksums: Dict[str, str]) -> Tuple[Callable[[], Awaitable[None]], str]:
+    """导入迁移模块，返回 (迁移函数, 台账校验和)"""
+    fn_name = dict(MIGRATIONS)[mod_name]
+    mod = __import__(f"scripts.{mod_name}", fromlist=[fn_name])
+    return getattr(mod, fn_name), ledger_checksums[mod_name]
+
+
+async def run_all_migrations() -> None:
+    """分层执行全部迁移（台账中源码未变的迁移跳过）；任一迁移失败则在当前层结束后抛出异常"""
+    try:
+        applied = await with_conn(_ledger.applied)
+        ledger_checksums = _ledger.checksums()
+        for layer in build_layers():
+            loaded = {name: _load(name, ledger_checksums) for name in layer}
+            pending = [name for name in layer if applied.get(name) != loaded[name][1]]
+            for name in layer:
+                if name not in pending:
+                    print(f"⏭️  {name} 已应用，跳过")
+            results = await asyncio.gather(*(loaded[name][0]() for name in pending), return_exceptions=True)
+            errors = [(name, r) for name, r in zip(pending, results) if isinstance(r, BaseException)]
+            for name in pending:
+                if name not in dict(errors):
+                    await with_conn(lambda conn, name=name: _ledger.mark(conn, name, loaded[name][1]))
+                    print(f"✅ {name} 完成")
+            if errors:
+                for name, err in errors:
+                    print(f"❌ {name} 失败: {err}")
+                raise errors[0][1]
+    finally:
+        await close_pool()
+
+
+async def main():
+    from app.core.migration_version import compute_migration_version, write_applied_version
+
+    await run_all_migrations()
+    write_applied_version(compute_migration_version())
+    print("\n✅ 所有迁移执行完成")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
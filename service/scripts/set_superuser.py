@@ -3,54 +3,45 @@
 设置用户为超级管理员脚本
 用于将指定用户设置为超级管理员
 """
-import asyncio
 import asyncpg
+
+if not __package__:
+    import _bootstrap  # noqa: F401
+
 from app.core.config import settings
+from scripts._migrate_runtime import run_migration, with_conn
 
 
-async def set_user_as_superuser(username: str):
+async def set_user_as_superuser(conn: asyncpg.Connection, username: str):
     """将指定用户设置为超级管理员"""
-    # 连接到 PostgreSQL
-    conn = await asyncpg.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        database=settings.POSTGRES_DB,
-    )
-    
     try:
-        # 检查用户是否存在
+        # 条件 UPDATE 一次完成检查与更新（不存在先查后改的竞态）；未更新时才查询区分「不存在」与「已是超级管理员」
         user = await conn.fetchrow(
-            "SELECT id, username, email, is_superuser FROM users WHERE username = $1",
+            "UPDATE users SET is_superuser = TRUE WHERE username = $1 AND is_superuser IS NOT TRUE RETURNING id, email",
             username
         )
         
-        if not user:
-            print(f"❌ 用户 '{username}' 不存在")
-            return False
-        
-        # 检查是否已经是超级管理员
-        if user['is_superuser']:
-            print(f"ℹ️  用户 '{username}' 已经是超级管理员")
+        if user:
+            print(f"✅ 成功将用户 '{username}' 设置为超级管理员")
+            print(f"   用户ID: {user['id']}")
+            print(f"   邮箱: {user['email']}")
             return True
         
-        # 更新用户为超级管理员
-        await conn.execute(
-            "UPDATE users SET is_superuser = TRUE WHERE username = $1",
+        user_exists = await conn.fetchval(
+            "SELECT EXISTS(SELECT 1 FROM users WHERE username = $1)",
             username
         )
         
-        print(f"✅ 成功将用户 '{username}' 设置为超级管理员")
-        print(f"   用户ID: {user['id']}")
-        print(f"   邮箱: {user['email']}")
+        if not user_exists:
+            print(f"❌ 用户 '{username}' 不存在")
+            return False
+        
+        print(f"ℹ️  用户 '{username}' 已经是超级管理员")
         return True
         
     except Exception as e:
         print(f"❌ 设置超级管理员失败: {e}")
         raise
-    finally:
-        await conn.close()
 
 
 async def main():
@@ -75,7 +66,7 @@ async def main():
     username = "shzjj82"
     
     try:
-        success = await set_user_as_superuser(username)
+        success = await with_conn(lambda conn: set_user_as_superuser(conn, username))
         
         if success:
             print("=" * 50)
@@ -99,4 +90,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_migration(main)
@@ -5,11 +5,11 @@
 用法: cd service && PYTHONPATH=. python scripts/verify_startup_migrations.py
 """
 import asyncio
+import importlib
 import sys
-from pathlib import Path
 
-project_root = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(project_root))
+if not __package__:
+    import _bootstrap  # noqa: F401
 
 
 async def main():
@@ -22,16 +22,34 @@ async def main():
         print("迁移版本已是最新，跳过预检查")
         return
 
+    from scripts import _ledger
+    from scripts._migrate_runtime import close_pool, with_conn
+    from scripts.run_all_migrations import build_layers
+
+    # 迁移模块在版本检查通过后才导入（版本一致时不产生任何导入开销），每个模块只解析一次
+    fn_names = dict(MIGRATIONS)
+    ledger_checksums = _ledger.checksums()
+
+    async def run(mod_name: str) -> None:
+        mod = importlib.import_module(f"scripts.{mod_name}")
+        await getattr(mod, fn_names[mod_name])()
+
+    # 与 run_all_migrations 相同按依赖分层，同层并发执行（共享连接池限制并发数）；失败不中断，汇总后统一报告
     errors = []
-    for mod_name, fn_name in MIGRATIONS:
-        try:
-            mod = __import__(f"scripts.{mod_name}", fromlist=[fn_name])
-            fn = getattr(mod, fn_name)
-            await fn()
-            print(f"✅ {mod_name}.{fn_name}() 成功")
-        except Exception as e:
-            print(f"❌ {mod_name}.{fn_name}() 失败: {e}")
-            errors.append((mod_name, str(e)))
+    try:
+        for layer in build_layers():
+            results = await asyncio.gather(*(run(name) for name in layer), return_exceptions=True)
+            for mod_name, result in zip(layer, results):
+                fn_name = fn_names[mod_name]
+                if isinstance(result, BaseException):
+                    print(f"❌ {mod_name}.{fn_name}() 失败: {result}")
+                    errors.append((mod_name, str(result)))
+                else:
+                    # 与 main.py 相同写入台账：此后 main.py 因版本一致跳过迁移，台账须在此记录
+                    await with_conn(lambda conn: _ledger.mark(conn, mod_name, ledger_checksums[mod_name]))
+                    print(f"✅ {mod_name}.{fn_name}() 成功")
+    finally:
+        await close_pool()
     if errors:
         print(f"\n共 {len(errors)} 个脚本失败")
         sys.exit(1)